@@ -1,9 +1,9 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Header, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 import chardet
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 
 import logging
 import uvicorn
@@ -12,13 +12,24 @@ import tempfile
 import glob
 import atexit
 import asyncio
+import uuid
+import hmac
+from contextlib import asynccontextmanager, contextmanager, ExitStack
 from pathlib import Path
 
 # Assuming these are in your project structure
-from transcribe import extract_audio, transcribe_audio_to_text, save_transcription_to_txt, save_translated_text
-from model import load_gemini_model
-llm = load_gemini_model() # Make sure 'model.py' exists and load_gemini_model works
+from transcribe import extract_audio, save_transcription_to_txt, save_translated_text, loaded_model_keys
+from model import load_llm_backend
+llm = load_llm_backend() # Backend chosen by LLM_BACKEND: 'gemini' (default), 'openai' or 'fake'
 from translate import translate_text # Make sure 'translate.py' exists and translate_text works
+from scheduler import TranscriptionScheduler
+from cancellation import CancellationToken, JobCancelled, register_job, unregister_job, cancel_job, active_job_ids
+from checkpoint import Checkpoint, CheckpointBusy, file_hash, text_hash, prune_checkpoints
+from pipeline import run_pipeline
+from admission import AdmissionController, AdmissionRejected, estimate_job_cost
+from tuning import get_tuned_settings
+from model_store import MODEL_STORE_DIR, list_models, warm_page_cache
+import profiler
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -38,6 +49,10 @@ class TranscriptionResponse(BaseModel):
     description: str = Field(..., description="A detailed description of the transcription process outcome.")
     transcript_path: str = Field(..., description="The file path where the generated transcript (VTT format) is saved on the server.")
     message: str = Field("Transcription completed successfully", description="A confirmation message for successful transcription.")
+    silence_skipping: Optional[dict] = Field(None, description="When silence skipping is enabled: total and speech duration, percentage of audio skipped and estimated decode time saved.")
+    detected_language: Optional[str] = Field(None, description="The language code detected when the request used language='auto'.")
+    job_id: Optional[str] = Field(None, description="The id of the job, usable with the `/cancel/{job_id}` endpoint.")
+    partial: bool = Field(False, description="True if the deadline was reached and only part of the audio was transcribed.")
 
 class TranslationRequest(BaseModel):
     source_language: str = Field(..., description="The original language of the input text (e.g., 'English', 'Japanese').")
@@ -47,6 +62,20 @@ class TranslationResponse(BaseModel):
     description: str = Field(..., description="A detailed description of the translation process outcome.")
     output_file: str = Field(..., description="The file path where the translated subtitle (VTT format) is saved on the server.")
     message: str = Field("Translation completed successfully", description="A confirmation message for successful translation.")
+    job_id: Optional[str] = Field(None, description="The id of the job, usable with the `/cancel/{job_id}` endpoint.")
+    partial: bool = Field(False, description="True if the deadline was reached and only part of the subtitles were translated.")
+
+class PipelineResponse(BaseModel):
+    transcript_path: str = Field(..., description="The file path where the generated transcript (VTT format) is saved on the server.")
+    output_file: Optional[str] = Field(None, description="The file path where the translated subtitle (VTT format) is saved on the server.")
+    cues: int = Field(..., description="The number of subtitle cues transcribed.")
+    translated_cues: int = Field(..., description="The number of subtitle cues translated.")
+    detected_language: Optional[str] = Field(None, description="The language code detected when the request used language='auto'.")
+    transcription_time: float = Field(..., description="Seconds until transcription finished.")
+    total_time: float = Field(..., description="Seconds until both transcription and translation finished.")
+    message: str = Field("Transcription and translation completed successfully", description="A confirmation message.")
+    job_id: Optional[str] = Field(None, description="The id of the job, usable with the `/cancel/{job_id}` endpoint.")
+    partial: bool = Field(False, description="True if the deadline was reached and only part of the audio was processed.")
 
 class FileDownloadResponse(BaseModel):
     filename: str = Field(..., description="The name of the file being downloaded.")
@@ -58,6 +87,19 @@ class ErrorResponse(BaseModel):
     detail: str = Field(..., description="Detailed information about the error.")
     status_code: int = Field(..., description="The HTTP status code associated with the error.")
 
+class CancelResponse(BaseModel):
+    job_id: str = Field(..., description="The id of the cancelled job.")
+    message: str = Field(..., description="A confirmation message for the cancellation request.")
+
+class ProfileResponse(BaseModel):
+    session_id: str = Field(..., description="The id of the profiling session.")
+    running: bool = Field(..., description="True while the profiler is still sampling.")
+    duration: float = Field(..., description="Seconds sampled so far.")
+    interval: float = Field(..., description="Seconds between samples.")
+    samples: int = Field(..., description="Number of samples taken.")
+    folded: str = Field(..., description="Sampled stacks in folded format ('frame;frame;frame count'), readable by flamegraph.pl and speedscope.")
+    memory: Optional[List[str]] = Field(None, description="Top tracemalloc allocation growth by line, when memory tracing was requested.")
+
 class CleanupResponse(BaseModel):
     message: str = Field(..., description="A summary message about the cleanup operation.")
     cleaned_files: List[str] = Field(..., description="A list of file paths that were successfully removed during cleanup.")
@@ -93,6 +135,27 @@ current_audio_filename = None
 current_transcript_path = None
 current_translated_path = None
 intermediate_files = set()  # Track all intermediate files for cleanup
+# Checkpoints of jobs that were never resumed are removed by cleanup after this long
+CHECKPOINT_MAX_AGE_HOURS = float(os.getenv("CHECKPOINT_MAX_AGE_HOURS", "168"))
+
+# Micro-batching scheduler: queued compatible transcription jobs run back-to-back
+# on one warm Whisper model instance
+transcription_scheduler = TranscriptionScheduler(
+    max_wait=float(os.getenv("TRANSCRIBE_BATCH_MAX_WAIT", "0")),
+    max_batch=int(os.getenv("TRANSCRIBE_BATCH_MAX_SIZE", "8")),
+    num_workers=int(os.getenv("TRANSCRIBE_WORKERS") or get_tuned_settings()["num_workers"]),
+)
+
+# Admission control: Whisper jobs are admitted against a CPU/RAM budget, with a
+# bounded wait queue and a per-client cap on running plus queued jobs. Cached
+# models are charged once, as long as they stay loaded
+admission_controller = AdmissionController(
+    cpu_budget=int(os.getenv("ADMISSION_CPU_BUDGET", "0")) or None,
+    ram_budget_mb=float(os.getenv("ADMISSION_RAM_BUDGET_MB", "0")) or None,
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "16")),
+    per_client_limit=int(os.getenv("ADMISSION_PER_CLIENT_LIMIT", "4")),
+    loaded_models=loaded_model_keys,
+)
 
 async def add_to_cleanup(file_path: str):
     """Adds a file path to a set of intermediate files to be cleaned up later."""
@@ -132,6 +195,12 @@ async def cleanup_intermediate_files() -> CleanupResponse:
                         logger.info(f"Cleaned up pattern file: {file_path}")
                 except Exception as e:
                     logger.warning(f"Failed to clean up {file_path}: {e}")
+
+    # Expire checkpoints of abandoned jobs; those of running jobs are skipped
+    try:
+        cleaned_files.extend(await asyncio.to_thread(prune_checkpoints, CHECKPOINT_MAX_AGE_HOURS * 3600))
+    except Exception as e:
+        logger.warning(f"Failed to prune checkpoints: {e}")
     
     return CleanupResponse(
         message=f"Cleanup completed. Removed {len(cleaned_files)} files.",
@@ -139,6 +208,99 @@ async def cleanup_intermediate_files() -> CleanupResponse:
         files_count=len(cleaned_files)
     )
 
+async def watch_for_disconnect(request: Request, cancel_token: CancellationToken):
+    """Cancels the job's token as soon as the client disconnects."""
+    while not cancel_token.cancelled:
+        if await request.is_disconnected():
+            cancel_token.cancel("client disconnected")
+            return
+        await asyncio.sleep(0.5)
+
+@asynccontextmanager
+async def cancellable_job(request: Request, job_id: Optional[str], deadline_seconds: Optional[float]):
+    """
+    Registers a cancellation token for the duration of a request, so the job can be
+    stopped via `/cancel/{job_id}`, by client disconnect, or by its deadline.
+    """
+    job_id = job_id or uuid.uuid4().hex
+    cancel_token = CancellationToken(deadline_seconds)
+    # A reused id would take over the other job's cancellation and profiling
+    if not register_job(job_id, cancel_token):
+        raise HTTPException(status_code=409, detail=f"A job with id {job_id} is already running.")
+    profiler.on_job_start(job_id)
+    watcher = asyncio.create_task(watch_for_disconnect(request, cancel_token))
+    try:
+        yield job_id, cancel_token
+    finally:
+        watcher.cancel()
+        profiler.on_job_end(job_id)
+        unregister_job(job_id)
+
+def check_cancelled(job_id: str, cancel_token: CancellationToken, has_results: bool):
+    """
+    Raises if the job stopped early because it was cancelled. A job that hit its
+    deadline is only an error if it produced nothing; otherwise its partial result
+    is returned. A job that finished before the cancellation is not affected.
+    """
+    if not cancel_token.interrupted:
+        return
+    if cancel_token.reason != "deadline":
+        raise HTTPException(status_code=409, detail=f"Job {job_id} was cancelled ({cancel_token.reason}).")
+    if not has_results:
+        raise HTTPException(status_code=504, detail=f"Job {job_id} exceeded its deadline before producing any results.")
+
+@contextmanager
+def exclusive(*checkpoints: Checkpoint):
+    """
+    Holds the checkpoints for the duration of the block, so a retry of a job that
+    is still running can't resume from, append to or clear its checkpoint file.
+    """
+    with ExitStack() as stack:
+        try:
+            for checkpoint in checkpoints:
+                stack.enter_context(checkpoint)
+        except CheckpointBusy as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        yield
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints need the X-Admin-Token header to match ADMIN_TOKEN; they are disabled if it is unset."""
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled. Set ADMIN_TOKEN to enable them.")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+def profile_response(session_id: str, session: profiler.SamplingProfiler, output_format: str):
+    if output_format == "folded":
+        return PlainTextResponse(session.folded())
+    return ProfileResponse(session_id=session_id, **session.result())
+
+def client_id_for(request: Request) -> str:
+    """Identifies the client for fair-share quotas: the X-Client-Id header, else the remote address."""
+    return request.headers.get("X-Client-Id") or (request.client.host if request.client else "unknown")
+
+@asynccontextmanager
+async def admitted(request: Request, job_id: str, cancel_token: CancellationToken, file_path: str,
+                   model_size: str, compute_type: Optional[str], device: str):
+    """
+    Holds an admission slot for a Whisper job for the duration of the block.
+    Responds 429 with Retry-After when the server can't queue the job.
+    """
+    settings = get_tuned_settings(model_size, device, compute_type)
+    cost = await asyncio.to_thread(estimate_job_cost, file_path, model_size, settings["compute_type"], device,
+                                   settings["cpu_threads"] or None)
+    try:
+        async with admission_controller.admit(client_id_for(request), cost, cancel_token):
+            yield cost
+    except AdmissionRejected as e:
+        logger.warning(f"Rejected job {job_id}: {e}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except JobCancelled:
+        cancel_token.mark_interrupted()
+        check_cancelled(job_id, cancel_token, False)
+        raise
+
 async def save_uploaded_file(uploaded_file: UploadFile, file_path: str):
     """Async helper to save uploaded file."""
     with open(file_path, "wb") as f:
@@ -194,11 +356,16 @@ async def extract_audio_endpoint(
 @app.post("/transcribe_audio", response_model=TranscriptionResponse, summary="Transcribe Audio to Text",
           description="Transcribes an audio file into text using the specified Whisper ASR model. The resulting transcript is saved as a VTT file.")
 async def transcribe_audio_endpoint(
+    request: Request,
     audio_file: UploadFile = File(..., description="The audio file to be transcribed. This is typically the output from the `/extract_audio` endpoint."),
-    language: str = Form("ja", description="The language of the audio content. E.g., 'en' for English, 'ja' for Japanese, 'de' for German."),
+    language: str = Form("ja", description="The language of the audio content. E.g., 'en' for English, 'ja' for Japanese, 'de' for German, or 'auto' to detect it from a few sampled windows of the audio."),
     model_size: str = Form("small", description="The size of the Whisper model to use for transcription. Available options: 'tiny', 'base', 'small', 'medium'."),
     device: str = Form("cpu", description="The computing device for transcription. 'cpu' for CPU, 'cuda' for GPU."),
-    compute_type: str = Form("int8", description="The precision for computations. 'int8' (integer 8-bit) for faster processing, 'float16' (half-precision) for balanced performance, 'float32' (full-precision) for maximum accuracy.")
+    compute_type: Optional[str] = Form(None, description="The precision for computations. 'int8' (integer 8-bit) for faster processing, 'float16' (half-precision) for balanced performance, 'float32' (full-precision) for maximum accuracy. Defaults to the calibrated tuning profile, else 'int8'."),
+    skip_silence: bool = Form(False, description="Run a voice activity detection pre-pass and only transcribe speech regions, skipping silence and music."),
+    vad_method: str = Form("silero", description="The voice activity detector used when skip_silence is enabled: 'silero' or 'energy'."),
+    job_id: Optional[str] = Form(None, description="Optional client-chosen job id, so the job can be cancelled via `/cancel/{job_id}` while it runs."),
+    deadline_seconds: Optional[float] = Form(None, description="Optional time budget in seconds. When it runs out, transcription stops and the partial transcript is returned.")
 ):
     """
     Endpoint to transcribe audio to text using Whisper ASR.
@@ -212,15 +379,44 @@ async def transcribe_audio_endpoint(
             # Save the uploaded audio file to the temporary directory
             await save_uploaded_file(audio_file, input_audio_path)
 
+            # Checkpoint completed segments so a restarted job with the same audio resumes
+            audio_hash = await asyncio.to_thread(file_hash, input_audio_path)
+            checkpoint = Checkpoint(
+                "transcribe",
+                audio_hash,
+                {"language": language, "model_size": model_size, "device": device, "compute_type": compute_type,
+                 "skip_silence": skip_silence, "vad_method": vad_method}
+            )
+
             # Transcribe the audio file, passing the model_size
-            segments = await asyncio.to_thread(transcribe_audio_to_text, input_audio_path, language, model_size, device, compute_type)
+            job_stats = {}
+            with exclusive(checkpoint):
+                async with cancellable_job(request, job_id, deadline_seconds) as (job_id, cancel_token), \
+                        admitted(request, job_id, cancel_token, input_audio_path, model_size, compute_type, device):
+                    try:
+                        segments = await asyncio.wrap_future(
+                            transcription_scheduler.submit(
+                                input_audio_path, language, model_size, device, compute_type,
+                                skip_silence=skip_silence, vad_method=vad_method, stats=job_stats,
+                                cancel_token=cancel_token, checkpoint=checkpoint, audio_hash=audio_hash
+                            )
+                        )
+                    except asyncio.CancelledError:
+                        # The job was dropped from the queue by its cancellation token
+                        if not cancel_token.cancelled:
+                            raise
+                        cancel_token.mark_interrupted()
+                        segments = []
+                    check_cancelled(job_id, cancel_token, bool(segments))
+
+            detected_language = job_stats.pop("detected_language", None)
 
             # Save transcription with descriptive filename
             current_transcript_path = await asyncio.to_thread(
                 save_transcription_to_txt,
                 segments, 
                 audio_filename=audio_file.filename or current_audio_filename,
-                language=language
+                language=detected_language or language
             )
             
             # Add transcript to cleanup tracking
@@ -229,8 +425,14 @@ async def transcribe_audio_endpoint(
             return TranscriptionResponse(
                 description="Transcription file saved successfully.",
                 transcript_path=current_transcript_path,
-                message="Transcription completed successfully"
+                message="Transcription completed successfully",
+                silence_skipping=job_stats or None,
+                detected_language=detected_language,
+                job_id=job_id,
+                partial=cancel_token.interrupted
             )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error transcribing audio: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -238,9 +440,12 @@ async def transcribe_audio_endpoint(
 @app.post("/translate_text", response_model=TranslationResponse, summary="Translate Transcript Text",
           description="Translates the content of a VTT transcript file from a source language to a target language using a large language model (LLM). The translated text is saved as a new VTT file.")
 async def translate_text_endpoint(
+    request: Request,
     input_file: UploadFile = File(..., description="The input VTT transcript file to be translated."),
     source_language: str = Form(..., description="The original language of the text in the input file (e.g., 'English', 'Japanese')."),
     target_language: str = Form(..., description="The desired language for the translated output (e.g., 'English', 'German')."),
+    job_id: Optional[str] = Form(None, description="Optional client-chosen job id, so the job can be cancelled via `/cancel/{job_id}` while it runs."),
+    deadline_seconds: Optional[float] = Form(None, description="Optional time budget in seconds. When it runs out, translation stops and the chunks translated so far are returned."),
 ):
     """
     Endpoint to translate text from source to target language.
@@ -256,16 +461,28 @@ async def translate_text_endpoint(
             # Read the file with encoding detection
             text_from_file = await read_file_with_encoding_detection(temp_file_path)
 
-        translated_text, current_translated_path = await asyncio.to_thread(
-            translate_text,
-            llm, 
-            text_from_file, 
-            target_language, 
-            source_language,
+        checkpoint = Checkpoint(
+            "translate",
+            text_hash(text_from_file),
+            {"source_language": source_language, "target_language": target_language}
         )
-        
-        if current_translated_path is None:
+
+        with exclusive(checkpoint):
+            async with cancellable_job(request, job_id, deadline_seconds) as (job_id, cancel_token):
+                # Runs on the event loop: chunks go through the backend's async client concurrently
+                translated_text, translated_path = await translate_text(
+                    llm, 
+                    text_from_file, 
+                    target_language, 
+                    source_language,
+                    cancel_token=cancel_token,
+                    checkpoint=checkpoint,
+                )
+                check_cancelled(job_id, cancel_token, translated_path is not None)
+
+        if translated_path is None:
             raise HTTPException(status_code=500, detail="Translation failed")
+        current_translated_path = translated_path
 
         # Add translated file to cleanup tracking (but don't clean it immediately as user needs to download)
         await add_to_cleanup(current_translated_path)
@@ -273,13 +490,165 @@ async def translate_text_endpoint(
         return TranslationResponse(
             description="Translation file saved successfully.",
             output_file=current_translated_path,
-            message="Translation completed successfully"
+            message="Translation completed successfully",
+            job_id=job_id,
+            partial=cancel_token.interrupted
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error translating text: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/transcribe_and_translate", response_model=PipelineResponse, summary="Transcribe and Translate in One Pass",
+          description="Transcribes an audio file and translates the cues while transcription is still running, so total latency is close to the slower of the two stages. Both the transcript and the translated subtitle are saved as VTT files.")
+async def transcribe_and_translate_endpoint(
+    request: Request,
+    audio_file: UploadFile = File(..., description="The audio file to be transcribed and translated."),
+    language: str = Form("ja", description="The language code of the audio content, e.g. 'en', 'ja', 'de', or 'auto' to detect it."),
+    source_language: str = Form("auto", description="The original language of the audio, as passed to the translator (e.g., 'Japanese'). 'auto' uses the language Whisper transcribed."),
+    target_language: str = Form(..., description="The desired language for the translated output (e.g., 'English')."),
+    model_size: str = Form("small", description="The size of the Whisper model to use for transcription. Available options: 'tiny', 'base', 'small', 'medium'."),
+    device: str = Form("cpu", description="The computing device for transcription. 'cpu' for CPU, 'cuda' for GPU."),
+    compute_type: Optional[str] = Form(None, description="The precision for computations: 'int8', 'float16' or 'float32'. Defaults to the calibrated tuning profile, else 'int8'."),
+    chunk_size: int = Form(20, description="Number of cues sent to the LLM per translation request."),
+    skip_silence: bool = Form(False, description="Run a voice activity detection pre-pass and only transcribe speech regions, skipping silence and music."),
+    vad_method: str = Form("silero", description="The voice activity detector used when skip_silence is enabled: 'silero' or 'energy'."),
+    job_id: Optional[str] = Form(None, description="Optional client-chosen job id, so the job can be cancelled via `/cancel/{job_id}` while it runs."),
+    deadline_seconds: Optional[float] = Form(None, description="Optional time budget in seconds. When it runs out, the partial result is returned.")
+):
+    """
+    Endpoint to run transcription and translation as one overlapped pipeline.
+    """
+    global current_transcript_path, current_translated_path
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_audio_path = os.path.join(temp_dir, audio_file.filename)
+            await save_uploaded_file(audio_file, input_audio_path)
+
+            audio_hash = await asyncio.to_thread(file_hash, input_audio_path)
+            transcribe_checkpoint = Checkpoint(
+                "transcribe", audio_hash,
+                {"language": language, "model_size": model_size, "device": device, "compute_type": compute_type,
+                 "skip_silence": skip_silence, "vad_method": vad_method}
+            )
+            # Translated chunks are reused by cue index, so they are only valid for the
+            # exact cue stream of this transcription: key them on its full parameter set
+            translate_checkpoint = Checkpoint(
+                "pipeline", audio_hash,
+                {"transcription": transcribe_checkpoint.key, "chunk_size": chunk_size,
+                 "source_language": source_language, "target_language": target_language}
+            )
+
+            with exclusive(transcribe_checkpoint, translate_checkpoint):
+                async with cancellable_job(request, job_id, deadline_seconds) as (job_id, cancel_token), \
+                        admitted(request, job_id, cancel_token, input_audio_path, model_size, compute_type, device):
+                    result = await asyncio.to_thread(
+                        run_pipeline,
+                        llm, input_audio_path, language, source_language, target_language,
+                        model_size, device, compute_type,
+                        audio_filename=audio_file.filename or current_audio_filename,
+                        chunk_size=chunk_size, skip_silence=skip_silence, vad_method=vad_method,
+                        cancel_token=cancel_token,
+                        transcribe_checkpoint=transcribe_checkpoint, translate_checkpoint=translate_checkpoint,
+                        loop=asyncio.get_running_loop(), audio_hash=audio_hash, scheduler=transcription_scheduler
+                    )
+                    check_cancelled(job_id, cancel_token, result["cues"] > 0)
+
+        current_transcript_path = result["transcript_path"]
+        await add_to_cleanup(current_transcript_path)
+        if result["translated_path"]:
+            current_translated_path = result["translated_path"]
+            await add_to_cleanup(current_translated_path)
+
+        return PipelineResponse(
+            transcript_path=result["transcript_path"],
+            output_file=result["translated_path"],
+            cues=result["cues"],
+            translated_cues=result["translated_cues"],
+            transcription_time=result["transcription_time"],
+            total_time=result["total_time"],
+            detected_language=result["detected_language"],
+            job_id=job_id,
+            partial=cancel_token.interrupted
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in transcribe and translate pipeline: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/cancel/{job_id}", response_model=CancelResponse, summary="Cancel a Running Job",
+          description="Cancels a running transcription or translation job. Queued jobs are dropped immediately; running jobs stop at the next Whisper segment or translation chunk.")
+async def cancel_job_endpoint(job_id: str):
+    """
+    Endpoint to cancel a running job by id.
+    """
+    if not cancel_job(job_id):
+        raise HTTPException(status_code=404, detail=f"No active job with id {job_id}")
+    return CancelResponse(job_id=job_id, message="Cancellation requested")
+
+@app.post("/admin/profile/start", response_model=ProfileResponse, dependencies=[Depends(require_admin)],
+          summary="Start a Profiling Session",
+          description="Admin only. Starts a low-overhead sampling profiler across the pipeline hot paths (audio extraction, transcription, translation, saving) until it is stopped.")
+async def start_profile(
+    interval: float = Query(0.005, ge=profiler.MIN_INTERVAL, description="Seconds between samples."),
+    trace_memory: bool = False,
+    all_threads: bool = False
+):
+    session_id = profiler.start_session(interval, trace_memory, all_threads)
+    return profile_response(session_id, profiler.get_session(session_id), "json")
+
+@app.post("/admin/profile/window", dependencies=[Depends(require_admin)], summary="Profile a Time Window",
+          description="Admin only. Samples the pipeline for `duration` seconds and returns the result. Use format=folded for plain flame-graph input.")
+async def profile_window(
+    duration: float = 10.0,
+    interval: float = Query(0.005, ge=profiler.MIN_INTERVAL, description="Seconds between samples."),
+    trace_memory: bool = False,
+    all_threads: bool = False,
+    format: str = "json"
+):
+    session_id = profiler.start_session(interval, trace_memory, all_threads)
+    await asyncio.sleep(min(duration, 600.0))
+    session = await asyncio.to_thread(profiler.stop_session, session_id)
+    return profile_response(session_id, session, format)
+
+@app.post("/admin/profile/job/{job_id}", response_model=ProfileResponse, dependencies=[Depends(require_admin)],
+          summary="Profile a Job",
+          description="Admin only. Profiles the job with this id from when it starts until it finishes; pass the same id as `job_id` to the job's request. Results are fetched from `/admin/profile/{job_id}`.")
+async def profile_job(
+    job_id: str,
+    interval: float = Query(0.005, ge=profiler.MIN_INTERVAL, description="Seconds between samples."),
+    trace_memory: bool = False,
+    all_threads: bool = False
+):
+    existing = profiler.get_session(job_id)
+    if existing is not None and existing.running:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is already being profiled.")
+    if job_id in active_job_ids():
+        # Already running: profile from now until it finishes
+        profiler.start_session(interval, trace_memory, all_threads, session_id=job_id)
+        return profile_response(job_id, profiler.get_session(job_id), "json")
+    profiler.arm_job(job_id, interval, trace_memory, all_threads)
+    return ProfileResponse(session_id=job_id, running=False, duration=0.0, interval=interval, samples=0, folded="")
+
+@app.post("/admin/profile/{session_id}/stop", dependencies=[Depends(require_admin)], summary="Stop a Profiling Session",
+          description="Admin only. Stops a profiling session and returns its result.")
+async def stop_profile(session_id: str, format: str = "json"):
+    session = await asyncio.to_thread(profiler.stop_session, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"No profiling session {session_id}")
+    return profile_response(session_id, session, format)
+
+@app.get("/admin/profile/{session_id}", dependencies=[Depends(require_admin)], summary="Get a Profiling Result",
+         description="Admin only. Returns the samples collected so far by a profiling session.")
+async def get_profile(session_id: str, format: str = "json"):
+    session = profiler.get_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"No profiling session {session_id}")
+    return profile_response(session_id, session, format)
+
 @app.get("/download_transcript", summary="Download Original Transcript",
          description="Downloads the most recently generated original transcript file (VTT format) from the server. This file contains the text transcribed from the audio.")
 async def download_transcript():
@@ -370,7 +739,11 @@ async def health_check():
         "status": "healthy",
         "message": "CaptionCrafter API is running",
         "llm_loaded": llm is not None,
-        "intermediate_files_count": len(intermediate_files)
+        "llm_backend": llm.name if llm else None,
+        "intermediate_files_count": len(intermediate_files),
+        "transcription_scheduler": transcription_scheduler.stats(),
+        "active_jobs": active_job_ids(),
+        "admission": admission_controller.stats()
     }
 
 @app.get("/files/status", summary="Get Server File Status",
@@ -411,12 +784,25 @@ async def files_status():
         "files_directory": str(files_dir)
     }
 
+@app.on_event("startup")
+async def startup_event():
+    """
+    Start the transcription workers and optionally pre-load stored models into the page cache.
+    """
+    transcription_scheduler.start()
+    if os.getenv("MODEL_STORE_WARM", "0") == "1":
+        for name in await asyncio.to_thread(list_models):
+            await asyncio.to_thread(warm_page_cache, os.path.join(MODEL_STORE_DIR, name))
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """
     Cleanup intermediate files when the application shuts down.
     """
     logger.info("Application shutting down, cleaning up intermediate files...")
+    await asyncio.to_thread(transcription_scheduler.stop)
+    if llm:
+        await llm.aclose()
     try:
         result = await cleanup_intermediate_files()
         logger.info(f"Shutdown cleanup completed: {result.message}")
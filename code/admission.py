@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+
+from cancellation import JobCancelled
+from media import probe_media_duration
+
+logger = logging.getLogger(__name__)
+
+# Approximate resident memory (MB) of a loaded model and its decode speed as a
+# fraction of real time on one 4-thread CPU worker, both at int8
+MODEL_COSTS = {
+    "tiny": {"ram_mb": 300, "realtime_factor": 0.05},
+    "base": {"ram_mb": 400, "realtime_factor": 0.1},
+    "small": {"ram_mb": 900, "realtime_factor": 0.3},
+    "medium": {"ram_mb": 2200, "realtime_factor": 0.8},
+    "large-v2": {"ram_mb": 4000, "realtime_factor": 1.6},
+    "large-v3": {"ram_mb": 4000, "realtime_factor": 1.6},
+}
+COMPUTE_TYPE_MULTIPLIERS = {"int8": 1.0, "int8_float16": 1.2, "float16": 1.6, "float32": 2.5}
+DEFAULT_CPU_THREADS = 4
+# Per-job decode memory on top of the PCM: mel features, encoder output, beam buffers
+JOB_WORKING_RAM_MB = 150
+# Used when the media duration cannot be probed
+DEFAULT_DURATION = 600.0
+
+
+class AdmissionRejected(Exception):
+    """Raised when a job cannot be queued. `retry_after` is a hint in seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobCost:
+    """
+    Resources of one job. `ram_mb` is the job's own working memory; the model it
+    runs on is identified by `model_key` and charged separately, once per loaded model.
+    """
+
+    def __init__(self, cpu, ram_mb, est_seconds, duration, model_key=None):
+        self.cpu = cpu
+        self.ram_mb = ram_mb
+        self.est_seconds = est_seconds
+        self.duration = duration
+        self.model_key = model_key
+
+    def as_dict(self):
+        return {"cpu": self.cpu, "ram_mb": round(self.ram_mb), "est_seconds": round(self.est_seconds, 1),
+                "duration": round(self.duration, 1)}
+
+
+def model_ram_mb(model_size, compute_type="int8"):
+    """Approximate resident memory of one loaded model."""
+    model = MODEL_COSTS.get(model_size, MODEL_COSTS["medium"])
+    return model["ram_mb"] * COMPUTE_TYPE_MULTIPLIERS.get(compute_type, 1.0)
+
+
+def estimate_job_cost(file_path, model_size="small", compute_type="int8", device="cpu", cpu_threads=None):
+    """Estimates CPU slots, working RAM and run time of a Whisper job from its media duration."""
+    duration = probe_media_duration(file_path)
+    if duration is None:
+        duration = DEFAULT_DURATION
+    model = MODEL_COSTS.get(model_size, MODEL_COSTS["medium"])
+    multiplier = COMPUTE_TYPE_MULTIPLIERS.get(compute_type, 1.0)
+    # Decoded 16kHz float32 PCM is held in memory during transcription
+    pcm_mb = duration * 16000 * 4 / (1024 * 1024)
+    ram_mb = pcm_mb + JOB_WORKING_RAM_MB
+    if device == "cpu":
+        cpu = cpu_threads or DEFAULT_CPU_THREADS
+        est_seconds = duration * model["realtime_factor"] * multiplier
+    else:
+        # GPU jobs mostly need a CPU thread to feed the device
+        cpu = 1
+        est_seconds = duration * model["realtime_factor"] * 0.2
+    return JobCost(cpu, ram_mb, est_seconds, duration, model_key=(model_size, compute_type))
+
+
+def _total_ram_mb():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return 8192
+
+
+class _Waiter:
+    def __init__(self, client_id, cost, future):
+        self.client_id = client_id
+        self.cost = cost
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class AdmissionController:
+    """
+    Admits jobs against a CPU and RAM budget.
+
+    Model weights are shared by all jobs on the same (model_size, compute_type)
+    and stay resident while the model is cached, so each loaded model is charged
+    once, for as long as `loaded_models()` reports it or a running job uses it;
+    jobs are charged only their own working memory. Jobs that don't fit wait in a bounded queue. When capacity frees up, the
+    waiting job of the client with the fewest running jobs goes next, so one
+    client can't monopolise the server. Each client is also capped at
+    `per_client_limit` running plus queued jobs.
+    """
+
+    def __init__(self, cpu_budget=None, ram_budget_mb=None, max_queue=16, per_client_limit=4, loaded_models=None):
+        self.cpu_budget = cpu_budget or os.cpu_count() or 4
+        self.ram_budget_mb = ram_budget_mb or _total_ram_mb() * 0.75
+        self.max_queue = max_queue
+        self.per_client_limit = per_client_limit
+        # Callable returning the (model_size, compute_type) keys of the models currently loaded
+        self.loaded_models = loaded_models or set
+        self._cpu_used = 0
+        self._ram_used = 0.0
+        self._running = {}   # id(cost) -> (client_id, cost, started_at)
+        self._waiters = []
+
+    def _clamp(self, cost):
+        # A job bigger than the whole budget can still run, alone
+        return min(cost.cpu, self.cpu_budget), min(cost.ram_mb, self.ram_budget_mb)
+
+    def _model_keys(self, extra_key=None):
+        keys = set(self.loaded_models()) | {cost.model_key for _, cost, _ in self._running.values()}
+        if extra_key is not None:
+            keys.add(extra_key)
+        keys.discard(None)
+        return keys
+
+    def _model_ram(self, extra_key=None):
+        return sum(model_ram_mb(*key) for key in self._model_keys(extra_key))
+
+    def _fits(self, cost):
+        cpu, ram = self._clamp(cost)
+        return (self._cpu_used + cpu <= self.cpu_budget
+                and self._ram_used + self._model_ram(cost.model_key) + ram <= self.ram_budget_mb)
+
+    def _client_jobs(self, client_id, running_only=False):
+        running = sum(1 for c, _, _ in self._running.values() if c == client_id)
+        if running_only:
+            return running
+        return running + sum(1 for w in self._waiters if w.client_id == client_id)
+
+    def _start(self, client_id, cost):
+        cpu, ram = self._clamp(cost)
+        self._cpu_used += cpu
+        self._ram_used += ram
+        self._running[id(cost)] = (client_id, cost, time.monotonic())
+
+    def _release(self, cost):
+        if self._running.pop(id(cost), None) is None:
+            return
+        cpu, ram = self._clamp(cost)
+        self._cpu_used -= cpu
+        self._ram_used -= ram
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._waiters:
+            waiter = min(self._waiters, key=lambda w: (self._client_jobs(w.client_id, running_only=True), w.enqueued_at))
+            if not self._fits(waiter.cost) and self._running:
+                return
+            self._waiters.remove(waiter)
+            self._start(waiter.client_id, waiter.cost)
+            waiter.future.set_result(True)
+
+    def retry_after(self):
+        """Rough seconds until enough work has drained to accept new jobs."""
+        now = time.monotonic()
+        backlog = sum(max(0.0, cost.est_seconds - (now - started)) for _, cost, started in self._running.values())
+        backlog += sum(w.cost.est_seconds for w in self._waiters)
+        return max(1, math.ceil(backlog / max(1, len(self._running))))
+
+    @asynccontextmanager
+    async def admit(self, client_id, cost, cancel_token=None):
+        """
+        Waits until the job is admitted and holds its share of the budget while the
+        body runs. Raises AdmissionRejected if the queue or the client's quota is
+        full, or JobCancelled if the job is cancelled while waiting.
+        """
+        if self._client_jobs(client_id) >= self.per_client_limit:
+            raise AdmissionRejected(f"Client {client_id} already has {self.per_client_limit} jobs running or queued.",
+                                    self.retry_after())
+
+        if not self._waiters and self._fits(cost):
+            self._start(client_id, cost)
+        else:
+            if len(self._waiters) >= self.max_queue:
+                raise AdmissionRejected("Server is at capacity and the wait queue is full.", self.retry_after())
+            waiter = _Waiter(client_id, cost, asyncio.get_running_loop().create_future())
+            self._waiters.append(waiter)
+            logger.info(f"Job from {client_id} queued for admission ({len(self._waiters)} waiting)")
+            # Starts the job right away if nothing is running, even if resident models fill the budget
+            self._dispatch()
+            try:
+                while not waiter.future.done():
+                    await asyncio.wait({waiter.future}, timeout=0.5)
+                    if not waiter.future.done() and cancel_token is not None and cancel_token.cancelled:
+                        raise JobCancelled(cancel_token.reason)
+                    # An evicted model frees memory without any job finishing
+                    self._dispatch()
+            except BaseException:
+                if waiter.future.done():
+                    self._release(cost)
+                elif waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+
+        try:
+            yield
+        finally:
+            self._release(cost)
+
+    def stats(self):
+        return {
+            "cpu_used": self._cpu_used,
+            "cpu_budget": self.cpu_budget,
+            "ram_used_mb": round(self._ram_used + self._model_ram()),
+            "model_ram_mb": round(self._model_ram()),
+            "ram_budget_mb": round(self.ram_budget_mb),
+            "loaded_models": sorted(f"{size}/{compute_type}" for size, compute_type in self._model_keys()),
+            "running_jobs": len(self._running),
+            "queued_jobs": len(self._waiters),
+            "max_queue": self.max_queue,
+        }
@@ -2,6 +2,22 @@ import os
 import glob
 import requests
 
+lang_to_code = {
+    "english": "en",
+    "japanese": "ja",
+    "german": "de",
+    "spanish": "es",
+    "french": "fr",
+    "chinese": "zh",
+    "italian": "it",
+    "korean": "ko",
+    "russian": "ru",
+    "portuguese": "pt",
+    "arabic": "ar",
+    "hindi": "hi"
+}
+code_to_lang = {code: name for name, code in lang_to_code.items()}
+
 def get_translated_subtitles(file_path, source_lang_full, target_lang_full, source_lang_code):
     base_url = "http://localhost:8000"
     folder_path = os.path.dirname(file_path)
@@ -10,7 +26,12 @@ def get_translated_subtitles(file_path, source_lang_full, target_lang_full, sour
     with open(file_path, "rb") as f:
         files = {"audio_file": (base_name, f, "application/octet-stream")}
         data = {"language": source_lang_code, "model_size": "small", "device": "cpu", "compute_type": "int8"}
-        requests.post(f"{base_url}/transcribe_audio", files=files, data=data)
+        transcribe_response = requests.post(f"{base_url}/transcribe_audio", files=files, data=data)
+
+    # With language "auto" the server detects it; translate from what it found
+    if source_lang_code == "auto":
+        detected = transcribe_response.json().get("detected_language")
+        source_lang_full = code_to_lang.get(detected, detected or "unknown")
 
     transcript_response = requests.get(f"{base_url}/download_transcript")
     transcript_filename = os.path.join(folder_path, f"original_{base_name}.vtt")
@@ -31,28 +52,18 @@ def get_translated_subtitles(file_path, source_lang_full, target_lang_full, sour
 
     return translated_filename
 
-def process_folder(folder_path):
+def process_folder(folder_path, auto_detect=False):
+    """
+    Folders are named <source>_<target>, e.g. japanese_english. A source of
+    "auto" (e.g. auto_english), an unknown source, or auto_detect=True lets the
+    server detect each file's language, so mixed-language folders need no sorting.
+    """
     folder_name = os.path.basename(os.path.normpath(folder_path))
     parts = folder_name.split('_')
     source_lang_full = parts[0]
     target_lang_full = parts[1]
     
-    lang_to_code = {
-        "english": "en",
-        "japanese": "ja",
-        "german": "de",
-        "spanish": "es",
-        "french": "fr",
-        "chinese": "zh",
-        "italian": "it",
-        "korean": "ko",
-        "russian": "ru",
-        "portuguese": "pt",
-        "arabic": "ar",
-        "hindi": "hi"
-    }
-    
-    source_lang_code = lang_to_code.get(source_lang_full.lower(), "")
+    source_lang_code = "auto" if auto_detect else lang_to_code.get(source_lang_full.lower(), "auto")
 
     video_extensions = ["*.mp4", "*.mkv", "*.avi", "*.mov", "*.ts"]
     video_files = []
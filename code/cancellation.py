@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Raised when a job is cancelled before it produced any results."""
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation flag shared between the API and the worker threads.
+
+    Long-running loops check `cancelled` between units of work (Whisper segments,
+    translation chunks). A token with a deadline cancels itself once it expires.
+    A loop that actually stops short calls `mark_interrupted`, so a job that
+    finished just before being cancelled is still reported as complete.
+    """
+
+    def __init__(self, deadline_seconds=None):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self.reason = None
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        self.interrupted = False
+
+    def cancel(self, reason="cancelled"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks)
+        logger.info(f"Job cancelled ({reason})")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Cancellation callback failed: {e}")
+
+    def on_cancel(self, callback):
+        """Registers a callback run once when the token is cancelled."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    @property
+    def cancelled(self):
+        if not self._event.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline")
+        return self._event.is_set()
+
+    def mark_interrupted(self):
+        """Records that the work stopped before finishing because of this token."""
+        self.interrupted = True
+
+    @property
+    def keep_partial(self):
+        """Work cut short by the deadline is kept; work cut short by an explicit cancel is discarded."""
+        return not self.interrupted or self.reason == "deadline"
+
+    def sleep(self, seconds):
+        """Sleeps up to `seconds`, waking early on cancellation. Returns True if cancelled."""
+        if self.deadline is not None:
+            seconds = min(seconds, max(0.0, self.deadline - time.monotonic()))
+        self._event.wait(seconds)
+        return self.cancelled
+
+
+# Tokens of running jobs, keyed by job id, so they can be cancelled from another request
+_active_jobs = {}
+_active_jobs_lock = threading.Lock()
+
+
+def register_job(job_id, token):
+    """Registers a running job. Returns False, leaving the registry unchanged, if the id is already active."""
+    with _active_jobs_lock:
+        if job_id in _active_jobs:
+            return False
+        _active_jobs[job_id] = token
+        return True
+
+
+def unregister_job(job_id):
+    with _active_jobs_lock:
+        _active_jobs.pop(job_id, None)
+
+
+def cancel_job(job_id, reason="cancelled"):
+    """Cancels a running job. Returns False if no job with that id is active."""
+    with _active_jobs_lock:
+        token = _active_jobs.get(job_id)
+    if token is None:
+        return False
+    token.cancel(reason)
+    return True
+
+
+def active_job_ids():
+    with _active_jobs_lock:
+        return list(_active_jobs)
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import glob
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: only runs within this process are serialized
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DIR = "../files/checkpoints"
+
+# Checkpoint paths held by a run in this process
+_held_paths = set()
+_held_lock = threading.Lock()
+
+
+class CheckpointBusy(Exception):
+    """Raised when another run with the same input and parameters holds the checkpoint."""
+
+
+def _try_lock(lock_path):
+    """
+    Opens and flocks `lock_path` without blocking. Returns the open file, or None if
+    another process holds it. Lock files are deleted when a job completes, so the
+    lock only counts if the path still names the file that was locked.
+    """
+    while True:
+        lock_file = open(lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+        try:
+            if os.stat(lock_path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                return lock_file
+        except FileNotFoundError:
+            pass
+        # Locked a file that was deleted in the meantime; retry on the current one
+        lock_file.close()
+
+
+def prune_checkpoints(max_age_seconds, directory=CHECKPOINT_DIR):
+    """
+    Removes checkpoints (and their lock files) of jobs abandoned more than
+    `max_age_seconds` ago. Checkpoints held by a running job are kept.
+    Returns the removed paths.
+    """
+    removed = []
+    cutoff = time.time() - max_age_seconds
+    lock_paths = glob.glob(os.path.join(directory, "*.jsonl.lock"))
+    checkpoint_paths = set(glob.glob(os.path.join(directory, "*.jsonl"))) | {path[:-len(".lock")] for path in lock_paths}
+    for checkpoint_path in sorted(checkpoint_paths):
+        lock_path = f"{checkpoint_path}.lock"
+        existing = [path for path in (checkpoint_path, lock_path) if os.path.exists(path)]
+        try:
+            if not existing or max(os.path.getmtime(path) for path in existing) > cutoff:
+                continue
+        except FileNotFoundError:
+            continue
+        with _held_lock:
+            if checkpoint_path in _held_paths:
+                continue
+        lock_file = None
+        if fcntl is not None:
+            lock_file = _try_lock(lock_path)
+            if lock_file is None:
+                continue
+        try:
+            for path in (checkpoint_path, lock_path):
+                if os.path.exists(path):
+                    os.remove(path)
+                    removed.append(path)
+        except OSError as e:
+            logger.warning(f"Failed to prune checkpoint {checkpoint_path}: {e}")
+        finally:
+            if lock_file is not None:
+                lock_file.close()
+    if removed:
+        logger.info(f"Pruned {len(removed)} stale checkpoint files")
+    return removed
+
+
+class Checkpoint:
+    """
+    Append-only JSONL record of completed work for one job.
+
+    The file is keyed by stage, input hash and the parameters that affect the
+    output, so a restarted job with the same input picks up where it stopped.
+    A run holds the checkpoint exclusively (`with checkpoint:`); a concurrent run
+    of the same key gets CheckpointBusy instead of sharing the file.
+    """
+
+    def __init__(self, stage, input_hash, params=None, directory=CHECKPOINT_DIR):
+        key_material = json.dumps({"input": input_hash, "params": params or {}}, sort_keys=True)
+        self.key = hashlib.sha256(key_material.encode("utf-8")).hexdigest()[:24]
+        self.path = os.path.join(directory, f"{stage}-{self.key}.jsonl")
+        self._lock_file = None
+        os.makedirs(directory, exist_ok=True)
+
+    def acquire(self):
+        """Takes the exclusive lock on this key, or raises CheckpointBusy."""
+        with _held_lock:
+            if self.path in _held_paths:
+                raise CheckpointBusy(f"A job with the same input and parameters is already running ({self.key}).")
+            _held_paths.add(self.path)
+        if fcntl is not None:
+            # flock also excludes runs in other worker processes
+            lock_file = _try_lock(f"{self.path}.lock")
+            if lock_file is None:
+                with _held_lock:
+                    _held_paths.discard(self.path)
+                raise CheckpointBusy(f"A job with the same input and parameters is already running ({self.key}).")
+            self._lock_file = lock_file
+
+    def release(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        with _held_lock:
+            _held_paths.discard(self.path)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def load(self):
+        """Returns all intact records. A torn last line from a crash is ignored."""
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"Ignoring corrupt checkpoint record in {self.path}")
+                    break
+        if records:
+            logger.info(f"Loaded {len(records)} checkpoint records from {self.path}")
+        return records
+
+    def append(self, record):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear(self):
+        """Removes the checkpoint and its lock file once the job has completed."""
+        # The lock is still held here; a run that opens the old lock file afterwards
+        # notices it was deleted (see _try_lock) and locks a fresh one
+        for path in (self.path, f"{self.path}.lock"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+import subprocess
+import threading
+
+import numpy as np
+
+from media import ffmpeg_executable, probe_media_duration
+from checkpoint import file_hash
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+LANGUAGE_CACHE_PATH = "../files/language_cache.json"
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        try:
+            with open(LANGUAGE_CACHE_PATH, "r", encoding="utf-8") as f:
+                _cache = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            _cache = {}
+    return _cache
+
+
+def _store(content_hash, result):
+    with _cache_lock:
+        cache = _load_cache()
+        cache[content_hash] = result
+        os.makedirs(os.path.dirname(LANGUAGE_CACHE_PATH), exist_ok=True)
+        tmp_path = f"{LANGUAGE_CACHE_PATH}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, LANGUAGE_CACHE_PATH)
+
+
+def read_window(file_path, start, seconds):
+    """Decodes `seconds` of mono 16kHz PCM starting at `start`, seeking with ffmpeg instead of decoding the whole file."""
+    command = [
+        ffmpeg_executable(), "-hide_banner", "-loglevel", "error",
+        "-ss", f"{start:.2f}", "-t", f"{seconds:.2f}", "-i", file_path,
+        "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-",
+    ]
+    result = subprocess.run(command, capture_output=True, timeout=60, check=True)
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def sample_windows(duration, num_windows=3, window_seconds=30.0):
+    """Start times of evenly spread windows, skipping the very start and end (intros, credits)."""
+    if duration is None or duration <= window_seconds:
+        return [0.0]
+    span = duration - window_seconds
+    return [span * (i + 1) / (num_windows + 1) for i in range(num_windows)]
+
+
+def detect_language(audio_file, model, num_windows=3, window_seconds=30.0, content_hash=None):
+    """
+    Identifies the spoken language from a few sampled windows of the audio.
+
+    Whisper's language probabilities are summed over the windows, so one
+    window of music or silence doesn't decide the result. Results are cached
+    by content hash; pass `content_hash` if the caller already has it, so the
+    file isn't read twice. Returns (language_code, probability).
+    """
+    content_hash = content_hash or file_hash(audio_file)
+    with _cache_lock:
+        cached = _load_cache().get(content_hash)
+    if cached:
+        logger.info(f"Language of {audio_file} from cache: {cached['language']}")
+        return cached["language"], cached["probability"]
+
+    totals = {}
+    windows = 0
+    for start in sample_windows(probe_media_duration(audio_file), num_windows, window_seconds):
+        audio = read_window(audio_file, start, window_seconds)
+        if len(audio) < SAMPLE_RATE:
+            continue
+        _, _, all_probs = model.detect_language(audio=audio)
+        for language, probability in all_probs:
+            totals[language] = totals.get(language, 0.0) + probability
+        windows += 1
+
+    if not totals:
+        raise ValueError(f"Could not sample any audio from {audio_file} for language detection.")
+
+    language = max(totals, key=totals.get)
+    probability = totals[language] / windows
+    logger.info(f"Detected language of {audio_file}: {language} ({probability:.2f} over {windows} windows)")
+    _store(content_hash, {"language": language, "probability": probability})
+    return language, probability
@@ -0,0 +1,29 @@
+import logging
+import re
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+
+def ffmpeg_executable():
+    """The ffmpeg binary bundled with imageio-ffmpeg (a moviepy dependency), else the one on PATH."""
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return "ffmpeg"
+
+
+def probe_media_duration(file_path):
+    """Returns the media duration in seconds as reported by ffmpeg, or None."""
+    try:
+        result = subprocess.run([ffmpeg_executable(), "-hide_banner", "-i", file_path], capture_output=True, text=True, timeout=30)
+    except Exception as e:
+        logger.warning(f"Could not probe media duration of {file_path}: {e}")
+        return None
+    # ffmpeg exits non-zero without an output file but still prints the input info
+    match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
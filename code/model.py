@@ -1,6 +1,11 @@
 
 import os
+import re
+import time
+import asyncio
 import logging
+import threading
+import httpx
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_google_genai import ChatGoogleGenerativeAI, HarmCategory, HarmBlockThreshold
@@ -21,7 +26,7 @@ if not google_api_key:
 def load_gemini_model():
     if not google_api_key:
         logger.error("Cannot load Gemini: GOOGLE_API_KEY is missing.")
-        return None,
+        return None
     try:
         logger.info("Loading Gemini model...")
         # Using ChatGoogleGenerativeAI for chat-optimized models like gemini-pro
@@ -38,6 +43,194 @@ def load_gemini_model():
     except Exception as e:
         logger.error(f"Failed to load Gemini model: {e}", exc_info=True)
         return None
-    
 
 
+class LLMResponse:
+    """Minimal response object mirroring the `.content` attribute of LangChain messages."""
+
+    def __init__(self, content):
+        self.content = content
+
+
+class LLMBackend:
+    """
+    Base class for translation backends.
+
+    Subclasses implement `_invoke` and `_ainvoke`. The base class applies a
+    per-backend concurrency limit to both the sync and async paths, spaces
+    request starts at least `request_interval` seconds apart for rate-limited
+    APIs, and provides `abatch` on top of `ainvoke`.
+    """
+
+    name = "base"
+
+    def __init__(self, max_concurrency=4, request_interval=0.0):
+        self.max_concurrency = max_concurrency
+        self.request_interval = request_interval
+        self._sync_limit = threading.BoundedSemaphore(max_concurrency)
+        self._async_limits = {}
+        self._pace_lock = threading.Lock()
+        self._next_start = 0.0
+
+    def _invoke(self, prompt):
+        raise NotImplementedError
+
+    async def _ainvoke(self, prompt):
+        return await asyncio.to_thread(self._invoke, prompt)
+
+    def _reserve_start(self):
+        """Reserves the next request start time and returns the seconds to wait for it."""
+        if not self.request_interval:
+            return 0.0
+        with self._pace_lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.request_interval
+            return start - now
+
+    def invoke(self, prompt):
+        with self._sync_limit:
+            time.sleep(self._reserve_start())
+            return self._invoke(prompt)
+
+    async def ainvoke(self, prompt):
+        # asyncio.Semaphore is bound to the loop it is first used on
+        loop = asyncio.get_running_loop()
+        limit = self._async_limits.setdefault(loop, asyncio.Semaphore(self.max_concurrency))
+        async with limit:
+            await asyncio.sleep(self._reserve_start())
+            return await self._ainvoke(prompt)
+
+    async def abatch(self, prompts):
+        return await asyncio.gather(*(self.ainvoke(prompt) for prompt in prompts))
+
+    def close(self):
+        pass
+
+    async def aclose(self):
+        self.close()
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through LangChain. One client instance is reused for all calls."""
+
+    name = "gemini"
+
+    def __init__(self, llm, max_concurrency=4, request_interval=1.0):
+        super().__init__(max_concurrency, request_interval)
+        self.llm = llm
+
+    def _invoke(self, prompt):
+        return self.llm.invoke(prompt)
+
+    async def _ainvoke(self, prompt):
+        return await self.llm.ainvoke(prompt)
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """
+    Any OpenAI-compatible `/chat/completions` endpoint (vLLM, llama.cpp server, Ollama, ...).
+    Sync and async HTTP clients keep pooled keep-alive connections sized to the concurrency limit.
+    """
+
+    name = "openai"
+
+    def __init__(self, base_url, model, api_key=None, temperature=0.1, max_concurrency=4, timeout=120.0, request_interval=0.0):
+        super().__init__(max_concurrency, request_interval)
+        self.model = model
+        self.temperature = temperature
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+        self._client = httpx.Client(base_url=base_url, headers=headers, limits=limits, timeout=timeout)
+        self._async_client = httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=timeout)
+
+    def _payload(self, prompt):
+        return {
+            "model": self.model,
+            "temperature": self.temperature,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+
+    @staticmethod
+    def _parse(response):
+        response.raise_for_status()
+        return LLMResponse(response.json()["choices"][0]["message"]["content"])
+
+    def _invoke(self, prompt):
+        return self._parse(self._client.post("/chat/completions", json=self._payload(prompt)))
+
+    async def _ainvoke(self, prompt):
+        return self._parse(await self._async_client.post("/chat/completions", json=self._payload(prompt)))
+
+    def close(self):
+        """Closes the sync client; use `aclose` to also close the async one."""
+        self._client.close()
+
+    async def aclose(self):
+        self._client.close()
+        await self._async_client.aclose()
+
+
+class FakeBackend(LLMBackend):
+    """
+    Deterministic in-process stand-in for load tests and offline runs.
+
+    Understands the prompts built by `translate.translate_text` and returns the
+    same number of blocks, each tagged with `prefix`. `latency` simulates the
+    round-trip time of a real model.
+    """
+
+    name = "fake"
+
+    def __init__(self, prefix="[translated]", latency=0.0, separator="\n<--->\n", max_concurrency=16, request_interval=0.0):
+        super().__init__(max_concurrency, request_interval)
+        self.prefix = prefix
+        self.latency = latency
+        self.separator = separator
+        self.calls = 0
+
+    def _respond(self, prompt):
+        self.calls += 1
+        match = re.search(r"INPUT:\n(.*)\n\s*OUTPUT:", prompt, re.S)
+        if match:
+            blocks = [block.strip() for block in match.group(1).strip().split(self.separator.strip())]
+            return LLMResponse(self.separator.join(f"{self.prefix} {block}" for block in blocks))
+        text = prompt.split("TEXT:", 1)[-1].strip()
+        return LLMResponse(f"{self.prefix} {text}")
+
+    def _invoke(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(prompt)
+
+    async def _ainvoke(self, prompt):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(prompt)
+
+
+def load_llm_backend(backend=None):
+    """
+    Builds the translation backend selected by `backend` or the LLM_BACKEND
+    environment variable: 'gemini' (default), 'openai' or 'fake'.
+    """
+    backend = (backend or os.getenv("LLM_BACKEND", "gemini")).lower()
+    max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY") or (16 if backend == "fake" else 4))
+    # Gemini's free tier is rate limited, so requests are paced; local backends aren't
+    request_interval = float(os.getenv("LLM_REQUEST_INTERVAL") or (1.0 if backend == "gemini" else 0.0))
+    logger.info(f"Loading LLM backend '{backend}'...")
+
+    if backend == "gemini":
+        llm = load_gemini_model()
+        return GeminiBackend(llm, max_concurrency, request_interval) if llm else None
+    if backend == "openai":
+        base_url = os.getenv("LLM_BASE_URL", "http://localhost:8080/v1")
+        model = os.getenv("LLM_MODEL", "local-model")
+        return OpenAICompatibleBackend(base_url, model, api_key=os.getenv("LLM_API_KEY"), max_concurrency=max_concurrency,
+                                       request_interval=request_interval)
+    if backend == "fake":
+        return FakeBackend(latency=float(os.getenv("LLM_FAKE_LATENCY", "0")), max_concurrency=max_concurrency,
+                           request_interval=request_interval)
+
+    logger.error(f"Unknown LLM backend '{backend}'. Use 'gemini', 'openai' or 'fake'.")
+    return None
@@ -0,0 +1,179 @@
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+
+logger = logging.getLogger(__name__)
+
+MODEL_STORE_DIR = os.getenv("MODEL_STORE_DIR", "../models")
+# When set, models are only ever loaded from the store and never downloaded
+MODEL_STORE_OFFLINE = os.getenv("MODEL_STORE_OFFLINE", "0") == "1"
+MANIFEST_NAME = "manifest.json"
+
+
+def _sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while block := f.read(8 * 1024 * 1024):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _model_files(model_dir):
+    for name in sorted(os.listdir(model_dir)):
+        path = os.path.join(model_dir, name)
+        if name != MANIFEST_NAME and os.path.isfile(path):
+            yield name, path
+
+
+def write_manifest(model_dir, source, quantization=None):
+    """Records the size and SHA-256 of every file in a stored model."""
+    files = {name: {"size": os.path.getsize(path), "sha256": _sha256(path)} for name, path in _model_files(model_dir)}
+    manifest = {"source": source, "quantization": quantization, "files": files}
+    with open(os.path.join(model_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(model_dir):
+    path = os.path.join(model_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def verify_model(model_dir, full=True):
+    """
+    Checks a stored model against its manifest. With `full=False` only file
+    sizes are compared, which is cheap enough to do on every load.
+    """
+    manifest = read_manifest(model_dir)
+    if manifest is None:
+        logger.error(f"No manifest in {model_dir}")
+        return False
+    ok = True
+    for name, expected in manifest["files"].items():
+        path = os.path.join(model_dir, name)
+        if not os.path.exists(path) or os.path.getsize(path) != expected["size"]:
+            logger.error(f"{path} is missing or has the wrong size")
+            ok = False
+        elif full and _sha256(path) != expected["sha256"]:
+            logger.error(f"{path} failed checksum verification")
+            ok = False
+    return ok
+
+
+def fetch_model(model_size, store_dir=MODEL_STORE_DIR):
+    """Downloads a pre-converted CTranslate2 model from the hub into the store."""
+    from faster_whisper.utils import download_model
+
+    model_dir = os.path.join(store_dir, model_size)
+    os.makedirs(model_dir, exist_ok=True)
+    logger.info(f"Fetching {model_size} into {model_dir}...")
+    download_model(model_size, output_dir=model_dir)
+    # Drop the hub's cache bookkeeping, only the model files are kept
+    shutil.rmtree(os.path.join(model_dir, ".cache"), ignore_errors=True)
+    write_manifest(model_dir, source=model_size)
+    return model_dir
+
+
+def convert_model(model_size, quantization="int8", store_dir=MODEL_STORE_DIR):
+    """
+    Converts the original OpenAI checkpoint to CTranslate2 with the weights
+    already quantized, so loading skips the conversion. Needs `transformers` and `torch`.
+    """
+    from ctranslate2.converters import TransformersConverter
+
+    source = model_size if "/" in model_size else f"openai/whisper-{model_size}"
+    model_dir = os.path.join(store_dir, f"{model_size.split('/')[-1]}-{quantization}")
+    logger.info(f"Converting {source} to {model_dir} ({quantization})...")
+    converter = TransformersConverter(source, copy_files=["tokenizer.json", "preprocessor_config.json"])
+    converter.convert(model_dir, quantization=quantization, force=True)
+    write_manifest(model_dir, source=source, quantization=quantization)
+    return model_dir
+
+
+def warm_page_cache(model_dir):
+    """
+    Maps the model files read-only and touches every page, so worker processes
+    starting afterwards read the weights from the shared page cache, not disk.
+    """
+    total = 0
+    for name, path in _model_files(model_dir):
+        size = os.path.getsize(path)
+        if size == 0:
+            continue
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_WILLNEED"):
+                mapped.madvise(mmap.MADV_WILLNEED)
+            for offset in range(0, size, mmap.PAGESIZE):
+                mapped[offset]
+        total += size
+    logger.info(f"Warmed {total / (1024 * 1024):.0f}MB of {model_dir} into the page cache")
+    return total
+
+
+def list_models(store_dir=MODEL_STORE_DIR):
+    if not os.path.isdir(store_dir):
+        return []
+    return sorted(name for name in os.listdir(store_dir) if read_manifest(os.path.join(store_dir, name)))
+
+
+def resolve_model_path(model_size, compute_type=None, store_dir=MODEL_STORE_DIR, offline=MODEL_STORE_OFFLINE):
+    """
+    Returns the local path to load `model_size` from, preferring a variant
+    pre-quantized for `compute_type`. Falls back to the hub name unless offline.
+    """
+    candidates = [f"{model_size}-{compute_type}", model_size] if compute_type else [model_size]
+    for name in candidates:
+        model_dir = os.path.join(store_dir, name)
+        if read_manifest(model_dir) is not None:
+            if not verify_model(model_dir, full=False):
+                raise RuntimeError(f"Stored model {model_dir} is incomplete; re-run `python model_store.py fetch {model_size}`.")
+            return model_dir
+    if offline:
+        raise FileNotFoundError(f"Model '{model_size}' is not in the local store {store_dir} and MODEL_STORE_OFFLINE is set. "
+                                f"Run `python model_store.py fetch {model_size}` first.")
+    return model_size
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Manage the local Whisper model store.")
+    parser.add_argument("--store", default=MODEL_STORE_DIR, help="Model store directory.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    fetch_parser = commands.add_parser("fetch", help="Download pre-converted CTranslate2 models.")
+    fetch_parser.add_argument("models", nargs="+")
+    convert_parser = commands.add_parser("convert", help="Convert OpenAI checkpoints with pre-quantized weights.")
+    convert_parser.add_argument("models", nargs="+")
+    convert_parser.add_argument("--quantization", default="int8", help="e.g. int8, int8_float16, float16.")
+    verify_parser = commands.add_parser("verify", help="Verify stored models against their checksums.")
+    verify_parser.add_argument("models", nargs="*")
+    warm_parser = commands.add_parser("warm", help="Load stored models into the page cache.")
+    warm_parser.add_argument("models", nargs="*")
+    commands.add_parser("list", help="List stored models.")
+    args = parser.parse_args()
+
+    if args.command == "fetch":
+        for name in args.models:
+            fetch_model(name, args.store)
+    elif args.command == "convert":
+        for name in args.models:
+            convert_model(name, args.quantization, args.store)
+    elif args.command == "verify":
+        results = {name: verify_model(os.path.join(args.store, name)) for name in args.models or list_models(args.store)}
+        for name, ok in results.items():
+            print(f"{name}: {'OK' if ok else 'FAILED'}")
+        raise SystemExit(0 if all(results.values()) else 1)
+    elif args.command == "warm":
+        for name in args.models or list_models(args.store):
+            warm_page_cache(os.path.join(args.store, name))
+    elif args.command == "list":
+        for name in list_models(args.store):
+            manifest = read_manifest(os.path.join(args.store, name))
+            size = sum(f["size"] for f in manifest["files"].values())
+            print(f"{name}\t{manifest['source']}\t{manifest.get('quantization') or '-'}\t{size / (1024 * 1024):.0f}MB")
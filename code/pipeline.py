@@ -0,0 +1,201 @@
+import asyncio
+import concurrent.futures
+import logging
+import queue
+import threading
+import time
+
+from cancellation import CancellationToken
+from transcribe import iter_transcription_cues, format_timestamp, save_transcription_to_txt, save_translated_text
+from translate import translate_chunk, reconstruct_vtt
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def _run_loop(loop):
+    loop.run_forever()
+    loop.close()
+
+
+def run_pipeline(llm, audio_file, language="ja", source_language="japanese", target_language="english",
+                 model_size="medium", device="cuda", compute_type=None, audio_filename=None,
+                 chunk_size=20, context_size=3, queue_size=200, max_retries=3,
+                 skip_silence=False, vad_method="silero", stats=None, cancel_token=None,
+                 transcribe_checkpoint=None, translate_checkpoint=None, loop=None, audio_hash=None, scheduler=None):
+    """
+    Transcribes and translates one file with the two stages overlapped.
+
+    Cues flow from the Whisper segment generator (on a producer thread) into a
+    bounded queue. As soon as `chunk_size` cues have accumulated they are sent to
+    the LLM together with the previous `context_size` source cues as context, while
+    Whisper keeps decoding. Chunk translations run as coroutines on `loop` (the
+    server's event loop, so the backend's async client is reused) and overlap each
+    other up to the backend's concurrency limit. Both VTT files are written once at the end.
+    With a `scheduler`, the producer runs on one of its workers, so pipeline jobs
+    count against TRANSCRIBE_WORKERS and show in the scheduler's stats.
+    """
+    if not llm:
+        raise ValueError("Translation model is not available.")
+
+    own_loop = None
+    if loop is None:
+        own_loop = asyncio.new_event_loop()
+        threading.Thread(target=_run_loop, args=(own_loop,), name="pipeline-translator", daemon=True).start()
+        loop = own_loop
+
+    # The pipeline always needs a token so a failing consumer can stop the producer
+    cancel_token = cancel_token or CancellationToken()
+    cue_queue = queue.Queue(maxsize=queue_size)
+    producer_errors = []
+    timings = {"transcription_time": 0.0}
+    # Filled by the transcriber; carries the detected language when language="auto"
+    stats = stats if stats is not None else {}
+    started = time.monotonic()
+
+    def _put(item):
+        # Bounded put that gives up once the job is cancelled and nobody is consuming
+        while True:
+            try:
+                cue_queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                if cancel_token.cancelled:
+                    return False
+
+    def _produce(model=None):
+        try:
+            for cue in iter_transcription_cues(
+                audio_file, language, model_size, device, compute_type, model=model,
+                skip_silence=skip_silence, vad_method=vad_method, stats=stats,
+                cancel_token=cancel_token, checkpoint=transcribe_checkpoint, audio_hash=audio_hash
+            ):
+                if cue["text"].strip() and not _put(cue):
+                    cancel_token.mark_interrupted()
+                    return
+        except Exception as e:
+            logger.error(f"Transcription failed in pipeline: {e}")
+            producer_errors.append(e)
+        finally:
+            timings["transcription_time"] = round(time.monotonic() - started, 2)
+            _put(_DONE)
+
+    if scheduler is not None:
+        # A job dropped from the queue by cancellation never runs; its future is then done
+        producer = scheduler.submit(audio_file, language, model_size, device, compute_type, run=_produce, cancel_token=cancel_token)
+        producer_alive = lambda: not producer.done()
+        join_producer = lambda: concurrent.futures.wait([producer])
+    else:
+        producer = threading.Thread(target=_produce, name="pipeline-transcriber", daemon=True)
+        producer.start()
+        producer_alive = producer.is_alive
+        join_producer = producer.join
+
+    # Chunks translated by an earlier, interrupted run of the same job
+    completed_chunks = {}
+    if translate_checkpoint is not None:
+        for record in translate_checkpoint.load():
+            completed_chunks[record["chunk_start"]] = record["subs"]
+
+    transcript_cues = []
+    translated_subs = []
+    pending = []
+    # Chunk translations running on the event loop, in submission order
+    in_flight = []
+
+    def _source_language():
+        # "auto" means: whatever Whisper transcribed, detected or requested
+        if source_language not in (None, "auto"):
+            return source_language
+        return stats.get("detected_language") or (language if language not in (None, "auto") else "unknown")
+
+    async def _translate(chunk_start, chunk, context, chunk_source_language):
+        translated_chunk = await translate_chunk(llm, chunk, chunk_source_language, target_language, max_retries, cancel_token, context)
+        if translate_checkpoint is not None and len(translated_chunk) == len(chunk):
+            await asyncio.to_thread(translate_checkpoint.append, {"chunk_start": chunk_start, "subs": translated_chunk})
+        return translated_chunk
+
+    def _flush():
+        chunk = list(pending)
+        pending.clear()
+        chunk_start = chunk[0]["index"]
+        if chunk_start in completed_chunks:
+            translated_subs.extend(completed_chunks[chunk_start])
+            return
+        if cancel_token.cancelled:
+            return
+        context = "\n".join(cue["text"].strip() for cue in transcript_cues[max(0, chunk_start - context_size):chunk_start])
+        logger.info(f"--- Translating streamed chunk from index {chunk_start} ---")
+        in_flight.append(asyncio.run_coroutine_threadsafe(_translate(chunk_start, chunk, context, _source_language()), loop))
+
+    try:
+        while True:
+            try:
+                cue = cue_queue.get(timeout=0.5)
+            except queue.Empty:
+                # The producer may have given up on the end marker after a cancellation
+                if producer_alive():
+                    continue
+                break
+            if cue is _DONE:
+                break
+            transcript_cues.append(cue)
+            pending.append({
+                "index": len(transcript_cues) - 1,
+                "timestamp": f"{format_timestamp(cue['start'])} --> {format_timestamp(cue['end'])}",
+                "text": cue["text"].strip(),
+            })
+            if len(pending) >= chunk_size:
+                _flush()
+        if pending:
+            _flush()
+        for future in in_flight:
+            translated_subs.extend(future.result())
+    except BaseException:
+        cancel_token.cancel("pipeline failed")
+        for future in in_flight:
+            future.cancel()
+        raise
+    finally:
+        join_producer()
+        if own_loop is not None:
+            own_loop.call_soon_threadsafe(own_loop.stop)
+
+    if scheduler is not None:
+        if producer.cancelled():
+            # Cancelled while still queued, so nothing was transcribed
+            cancel_token.mark_interrupted()
+        elif producer.exception() is not None:
+            # The worker failed before the producer ran, e.g. the model didn't load
+            producer_errors.append(producer.exception())
+    if producer_errors:
+        raise producer_errors[0]
+
+    if cancel_token.cancelled and len(translated_subs) < len(transcript_cues):
+        cancel_token.mark_interrupted()
+    detected_language = stats.get("detected_language")
+    result = {
+        "transcript_path": None,
+        "translated_path": None,
+        "cues": len(transcript_cues),
+        "translated_cues": len(translated_subs),
+        "detected_language": detected_language,
+    }
+    if not cancel_token.keep_partial:
+        # Explicitly cancelled: leave no truncated files behind for the download endpoints
+        logger.warning(f"Pipeline cancelled ({cancel_token.reason}), discarding partial result.")
+        timings["total_time"] = round(time.monotonic() - started, 2)
+        return {**result, **timings}
+
+    result["transcript_path"] = save_transcription_to_txt(transcript_cues, audio_filename=audio_filename, language=detected_language or language)
+    if translated_subs:
+        translated_subs.sort(key=lambda sub: sub["index"])
+        result["translated_path"] = save_translated_text(reconstruct_vtt(translated_subs), audio_filename, _source_language(), target_language)
+        if translate_checkpoint is not None and len(translated_subs) == len(transcript_cues):
+            translate_checkpoint.clear()
+
+    timings["total_time"] = round(time.monotonic() - started, 2)
+    logger.info(f"Pipeline finished: {len(transcript_cues)} cues, {len(translated_subs)} translated, "
+                f"transcription {timings['transcription_time']}s, total {timings['total_time']}s")
+    return {**result, **timings}
@@ -0,0 +1,185 @@
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Stacks are kept only if they pass through one of these modules (the pipeline hot paths)
+FOCUS_MODULES = {"transcribe.py", "translate.py", "pipeline.py", "scheduler.py", "vad.py", "language_id.py", "model.py"}
+MAX_SESSIONS = 20
+# Shorter intervals turn the sampler into a busy loop that starves the server of the GIL
+MIN_INTERVAL = 0.001
+
+# Sessions currently using tracemalloc; it is stopped when the last one that needed it finishes
+_tracemalloc_users = 0
+_tracemalloc_started = False
+_tracemalloc_lock = threading.Lock()
+
+
+def _acquire_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_started
+    with _tracemalloc_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            _tracemalloc_started = True
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_started
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        # Tracing started outside the profiler (e.g. PYTHONTRACEMALLOC) is left running
+        if _tracemalloc_users == 0 and _tracemalloc_started:
+            tracemalloc.stop()
+            _tracemalloc_started = False
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler: a background thread snapshots every thread's stack
+    every `interval` seconds via sys._current_frames(). Nothing is hooked into
+    the profiled code, so the overhead is one stack walk per thread per sample.
+
+    Results are aggregated as folded stacks ("a;b;c count"), the input format of
+    flamegraph.pl, speedscope and similar tools. With `trace_memory`, tracemalloc
+    snapshots taken at start and stop give the top allocation growth by line.
+    """
+
+    def __init__(self, interval=0.005, trace_memory=False, all_threads=False):
+        if interval < MIN_INTERVAL:
+            raise ValueError(f"Sampling interval must be at least {MIN_INTERVAL}s, got {interval}.")
+        self.interval = interval
+        self.trace_memory = trace_memory
+        self.all_threads = all_threads
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+        self._stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._snapshot = None
+        self._memory = None
+
+    def start(self):
+        if self.trace_memory:
+            _acquire_tracemalloc()
+            self._snapshot = tracemalloc.take_snapshot()
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None or self.stopped_at is not None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self.stopped_at = time.time()
+        if self.trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            self._memory = [str(stat) for stat in snapshot.compare_to(self._snapshot, "lineno")[:25]]
+            self._snapshot = None
+            _release_tracemalloc()
+
+    @property
+    def running(self):
+        return self._thread is not None and self.stopped_at is None
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                focused = self.all_threads
+                while frame is not None:
+                    code = frame.f_code
+                    filename = os.path.basename(code.co_filename)
+                    focused = focused or filename in FOCUS_MODULES
+                    stack.append(f"{filename}:{code.co_name}")
+                    frame = frame.f_back
+                if focused:
+                    self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self._stacks.most_common())
+
+    def result(self):
+        end = self.stopped_at or time.time()
+        return {
+            "running": self.running,
+            "duration": round(end - self.started_at, 2) if self.started_at else 0.0,
+            "interval": self.interval,
+            "samples": self.samples,
+            "folded": self.folded(),
+            "memory": self._memory,
+        }
+
+
+# Profiling sessions by id, and profiling requests for jobs that haven't started yet
+_sessions = collections.OrderedDict()
+_armed_jobs = {}
+_lock = threading.Lock()
+
+
+def _add_session(session_id, session):
+    with _lock:
+        # A reused id (e.g. a job run again) replaces the old result; stop it first so
+        # its sampler thread and tracemalloc reference don't outlive it
+        previous = _sessions.pop(session_id, None)
+        if previous is not None:
+            previous.stop()
+        _sessions[session_id] = session
+        while len(_sessions) > MAX_SESSIONS:
+            _, oldest = _sessions.popitem(last=False)
+            oldest.stop()
+
+
+def start_session(interval=0.005, trace_memory=False, all_threads=False, session_id=None):
+    session_id = session_id or uuid.uuid4().hex
+    session = SamplingProfiler(interval, trace_memory, all_threads)
+    session.start()
+    _add_session(session_id, session)
+    logger.info(f"Started profiling session {session_id}")
+    return session_id
+
+
+def stop_session(session_id):
+    with _lock:
+        session = _sessions.get(session_id)
+    if session is None:
+        return None
+    session.stop()
+    logger.info(f"Stopped profiling session {session_id} after {session.samples} samples")
+    return session
+
+
+def get_session(session_id):
+    with _lock:
+        return _sessions.get(session_id)
+
+
+def arm_job(job_id, interval=0.005, trace_memory=False, all_threads=False):
+    """Profiles the job with this id for its whole lifetime. Results are stored under the job id."""
+    with _lock:
+        _armed_jobs[job_id] = {"interval": interval, "trace_memory": trace_memory, "all_threads": all_threads}
+
+
+def on_job_start(job_id):
+    with _lock:
+        options = _armed_jobs.pop(job_id, None)
+    if options is not None:
+        start_session(session_id=job_id, **options)
+
+
+def on_job_end(job_id):
+    session = get_session(job_id)
+    if session is not None and session.running:
+        stop_session(job_id)
@@ -0,0 +1,195 @@
+import logging
+import math
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+
+from transcribe import load_whisper_model, transcribe_audio_to_text
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptionJob:
+    """A pending transcription request waiting for a worker."""
+
+    def __init__(self, audio_file, language, model_size, device, compute_type, kwargs, run=None):
+        self.audio_file = audio_file
+        self.language = language
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.kwargs = kwargs
+        self.run = run
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+    @property
+    def key(self):
+        # Jobs sharing this key can run on the same warm model instance
+        return (self.model_size, self.language, self.compute_type, self.device)
+
+
+class TranscriptionScheduler:
+    """
+    Micro-batching scheduler in front of the Whisper workers.
+
+    Pending jobs with a compatible (model_size, language, compute_type, device)
+    are run back-to-back on one warm model instance, up to `max_batch` at a time.
+    faster-whisper decodes one file per call, so a batch saves model lookups, not
+    decode time: compatible jobs are first spread over the idle workers, and a
+    worker only takes several when there are more jobs than idle workers.
+    `max_wait` (default 0, dispatch immediately) only holds a lone job back to
+    collect compatible ones.
+    """
+
+    def __init__(self, max_wait=0.0, max_batch=8, num_workers=1):
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.num_workers = num_workers
+        self._pending = []
+        self._condition = threading.Condition()
+        self._workers = []
+        self._running = False
+        self._idle = 0
+        self.batches_run = 0
+        self.jobs_run = 0
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"whisper-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        logger.info(f"Transcription scheduler started with {self.num_workers} worker(s), max_wait={self.max_wait}s, max_batch={self.max_batch}")
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join(timeout=5)
+        self._workers = []
+
+    def submit(self, audio_file, language="ja", model_size="medium", device="cuda", compute_type=None, run=None, **kwargs):
+        """
+        Queues a transcription job and returns a concurrent.futures.Future with its segments.
+        Streaming callers pass `run`, a callable given the warm model and run on the
+        worker instead of `transcribe_audio_to_text`; the future then holds its return value.
+        """
+        if not self._running:
+            self.start()
+        job = TranscriptionJob(audio_file, language, model_size, device, compute_type, kwargs, run)
+        with self._condition:
+            self._pending.append(job)
+            self._condition.notify_all()
+        cancel_token = kwargs.get("cancel_token")
+        if cancel_token is not None:
+            # A job still waiting in the queue is dropped as soon as it is cancelled;
+            # a running job stops at the next segment boundary
+            cancel_token.on_cancel(lambda: self._discard(job))
+        return job.future
+
+    def _discard(self, job):
+        if job.future.cancel():
+            with self._condition:
+                if job in self._pending:
+                    self._pending.remove(job)
+                    # No worker will pick it up now; wake callers blocked in futures.wait()
+                    job.future.set_running_or_notify_cancel()
+                self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            pending = len(self._pending)
+        return {
+            "pending_jobs": pending,
+            "batches_run": self.batches_run,
+            "jobs_run": self.jobs_run,
+            "max_wait": self.max_wait,
+            "max_batch": self.max_batch,
+        }
+
+    def _next_batch(self):
+        """Blocks until a batch of compatible jobs is ready, or returns None on shutdown."""
+        with self._condition:
+            self._idle += 1
+            try:
+                while self._running and not self._pending:
+                    self._condition.wait()
+            finally:
+                self._idle -= 1
+            if not self._running:
+                return None
+
+            key = self._pending[0].key
+            deadline = self._pending[0].enqueued_at + self.max_wait
+            while self._running:
+                compatible = [job for job in self._pending if job.key == key]
+                remaining = deadline - time.monotonic()
+                if len(compatible) >= self.max_batch or remaining <= 0:
+                    break
+                self._condition.wait(timeout=remaining)
+
+            # Leave a fair share of the compatible jobs for the other idle workers
+            compatible = [job for job in self._pending if job.key == key]
+            batch_size = min(self.max_batch, math.ceil(len(compatible) / (self._idle + 1)))
+            batch = compatible[:batch_size]
+            for job in batch:
+                self._pending.remove(job)
+            return batch
+
+    def _worker_loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                # A worker must survive anything a batch throws, or queued jobs hang forever
+                logger.error(f"Transcription worker failed on a batch: {e}", exc_info=True)
+                for job in batch:
+                    try:
+                        job.future.set_exception(e)
+                    except InvalidStateError:
+                        pass
+
+    def _run_batch(self, batch):
+        first = batch[0]
+        logger.info(f"Running batch of {len(batch)} job(s) on {first.model_size}/{first.language}/{first.compute_type}")
+        try:
+            model = load_whisper_model(first.model_size, first.device, first.compute_type)
+        except Exception as e:
+            logger.error(f"Failed to load Whisper model for batch: {e}")
+            for job in batch:
+                # Jobs cancelled while the model was loading already have a final state
+                if job.future.set_running_or_notify_cancel():
+                    job.future.set_exception(e)
+            return
+
+        for job in batch:
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            try:
+                if job.run is not None:
+                    job.future.set_result(job.run(model))
+                    continue
+                segments = transcribe_audio_to_text(
+                    job.audio_file,
+                    job.language,
+                    job.model_size,
+                    job.device,
+                    job.compute_type,
+                    model=model,
+                    **job.kwargs
+                )
+                job.future.set_result(segments)
+            except Exception as e:
+                logger.error(f"Transcription job for {job.audio_file} failed: {e}")
+                job.future.set_exception(e)
+            finally:
+                self.jobs_run += 1
+        self.batches_run += 1
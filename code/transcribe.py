@@ -1,11 +1,20 @@
 import os
 from moviepy import VideoFileClip
 import whisper
-from faster_whisper import WhisperModel
+from faster_whisper import WhisperModel, decode_audio
 import logging
 import re
+import threading
+import time
+from collections import namedtuple, OrderedDict
+from vad import SAMPLE_RATE, detect_speech_regions, build_speech_audio, make_timestamp_mapper
+from tuning import get_tuned_settings
+from model_store import resolve_model_path, MODEL_STORE_OFFLINE
+from language_id import detect_language
 logger= logging.getLogger(__name__)
 
+_Word = namedtuple("_Word", ["start", "end", "word"])
+
 def extract_audio(input_video, input_video_name):
     output_directory = "../files"
     os.makedirs(output_directory, exist_ok=True)
@@ -33,63 +42,207 @@ def extract_audio(input_video, input_video_name):
 
 
 
-def transcribe_audio_to_text(audio_file , language="ja",model_size="medium",device="cuda",compute_type="int8",max_duration=2.0): 
-    
-    model = WhisperModel(model_size, device=device, compute_type=compute_type)
+# Warm WhisperModel instances keyed by model size, device and tuned settings so
+# repeated jobs don't pay the model load cost again. Least recently used models
+# are dropped once more than WHISPER_MODEL_CACHE_SIZE are loaded; a running job
+# keeps its own reference, so eviction only frees the model after it finishes.
+WHISPER_MODEL_CACHE_SIZE = max(1, int(os.getenv("WHISPER_MODEL_CACHE_SIZE", "2")))
+_whisper_models = OrderedDict()
+_whisper_models_lock = threading.Lock()
+# One lock per configuration being loaded, so concurrent first uses load it once
+_whisper_model_load_locks = {}
+
+def load_whisper_model(model_size="medium", device="cuda", compute_type=None):
+    """
+    Returns a cached WhisperModel for the given configuration, loading it on first use.
+    Thread and worker counts (and compute_type, if not given) come from the tuning profile.
+    """
+    settings = get_tuned_settings(model_size, device, compute_type)
+    key = (model_size, device, settings["compute_type"], settings["cpu_threads"], settings["num_workers"])
+    with _whisper_models_lock:
+        model = _whisper_models.get(key)
+        if model is not None:
+            _whisper_models.move_to_end(key)
+            return model
+        load_lock = _whisper_model_load_locks.setdefault(key, threading.Lock())
+    # Load outside the cache lock so lookups of other models and loaded_model_keys()
+    # (called from the event loop by admission control) don't wait on a download
+    with load_lock:
+        with _whisper_models_lock:
+            model = _whisper_models.get(key)
+        if model is not None:
+            return model
+        logger.info(f"Loading Whisper model {model_size} on {device} ({settings['compute_type']}, "
+                    f"cpu_threads={settings['cpu_threads']}, num_workers={settings['num_workers']})...")
+        # Prefer the local model store; only fall back to the hub when not offline
+        model_path = resolve_model_path(model_size, settings["compute_type"])
+        model = WhisperModel(model_path, device=device, compute_type=settings["compute_type"],
+                             cpu_threads=settings["cpu_threads"], num_workers=settings["num_workers"],
+                             local_files_only=MODEL_STORE_OFFLINE)
+        with _whisper_models_lock:
+            _whisper_models[key] = model
+            _whisper_model_load_locks.pop(key, None)
+            while len(_whisper_models) > WHISPER_MODEL_CACHE_SIZE:
+                evicted, _ = _whisper_models.popitem(last=False)
+                logger.info(f"Evicted Whisper model {evicted[0]} ({evicted[2]}) from the model cache")
+    return model
+
+
+def loaded_model_keys():
+    """The (model_size, compute_type) of every Whisper model currently in the cache."""
+    with _whisper_models_lock:
+        return {(key[0], key[2]) for key in _whisper_models}
+
+
+def transcribe_audio_to_text(audio_file , language="ja",model_size="medium",device="cuda",compute_type=None,max_duration=2.0, model=None,
+                             skip_silence=False, vad_method="silero", stats=None, cancel_token=None, checkpoint=None, audio_hash=None): 
     
-    # Crucially, enable word_timestamps to get precise timing for each word
-    segments, info = model.transcribe(
-        audio_file,
-        language=language,
-        beam_size=5,
-        word_timestamps=True,
-        task="transcribe"
-    )
-
-    all_words = []
-    for segment in segments:
-        # segment.words is a generator of word objects, each with start, end, and word
-        all_words.extend(list(segment.words))
-
-    if not all_words:
-        return []
-
-    final_segments = []
+    return list(iter_transcription_cues(
+        audio_file, language, model_size, device, compute_type, max_duration, model=model,
+        skip_silence=skip_silence, vad_method=vad_method, stats=stats, cancel_token=cancel_token, checkpoint=checkpoint,
+        audio_hash=audio_hash
+    ))
+
+
+def iter_transcription_cues(audio_file , language="ja",model_size="medium",device="cuda",compute_type=None,max_duration=2.0, model=None,
+                            skip_silence=False, vad_method="silero", stats=None, cancel_token=None, checkpoint=None, audio_hash=None):
+    """
+    Streaming variant of `transcribe_audio_to_text`: yields each cue dict as soon as
+    Whisper has decoded far enough to close it. With language="auto" the language is
+    detected from a few sampled windows first and reported as stats["detected_language"];
+    `audio_hash` (the file's checkpoint.file_hash, if already known) keys its cache.
+    """
+    words = _iter_words(audio_file, language, model_size, device, compute_type, model,
+                        skip_silence, vad_method, stats, cancel_token, checkpoint, audio_hash)
+    return group_words_into_cues(words, max_duration)
+
+
+def _iter_words(audio_file, language, model_size, device, compute_type, model,
+                skip_silence, vad_method, stats, cancel_token, checkpoint, audio_hash=None):
+    """Yields word timings on the original audio timeline as Whisper decodes them."""
+    if model is None:
+        model = load_whisper_model(model_size, device, compute_type)
+
+    if language in (None, "auto"):
+        language, _ = detect_language(audio_file, model, content_hash=audio_hash)
+        if stats is not None:
+            stats["detected_language"] = language
+
+    # Optionally drop silence/music before decoding and only feed speech regions to Whisper
+    audio_input = audio_file
+    remap = None
+    if skip_silence:
+        audio = decode_audio(audio_file, sampling_rate=SAMPLE_RATE)
+        regions = detect_speech_regions(audio, method=vad_method)
+        audio_input, offsets = build_speech_audio(audio, regions)
+        remap = make_timestamp_mapper(offsets)
+        total_duration = len(audio) / SAMPLE_RATE
+        speech_duration = len(audio_input) / SAMPLE_RATE
+        if speech_duration == 0:
+            logger.info(f"No speech detected in {audio_file}, skipping transcription.")
+            _report_silence_skipping(stats, total_duration, speech_duration, 0.0)
+            return
+
+    def _emit(words):
+        # Map word timestamps from the speech-only audio back onto the original timeline
+        if remap is not None:
+            return [_Word(remap(w.start), remap(w.end), w.word) for w in words]
+        return words
+
+    # Words from segments completed by an earlier, interrupted run of the same job
+    resume_from = 0.0
+    if checkpoint is not None:
+        for record in checkpoint.load():
+            yield from _emit([_Word(*w) for w in record["words"]])
+            resume_from = record["end"]
+        if resume_from:
+            logger.info(f"Resuming transcription of {audio_file} from checkpoint at {resume_from:.1f}s")
+
+    completed = False
+    decode_start = time.monotonic()
+    if cancel_token is not None and cancel_token.cancelled:
+        logger.info(f"Transcription of {audio_file} cancelled before decoding ({cancel_token.reason}).")
+        cancel_token.mark_interrupted()
+    else:
+        # Crucially, enable word_timestamps to get precise timing for each word
+        segments, info = model.transcribe(
+            audio_input,
+            language=language,
+            beam_size=get_tuned_settings(model_size, device, compute_type)["beam_size"],
+            word_timestamps=True,
+            task="transcribe",
+            clip_timestamps=[resume_from] if resume_from else "0"
+        )
+
+        for segment in segments:
+            # segment.words is a generator of word objects, each with start, end, and word
+            words = [_Word(w.start, w.end, w.word) for w in segment.words]
+            if checkpoint is not None:
+                checkpoint.append({"end": segment.end, "words": [list(w) for w in words]})
+            yield from _emit(words)
+            # Stop decoding between segments if the caller went away or the deadline passed
+            if cancel_token is not None and cancel_token.cancelled:
+                logger.info(f"Transcription of {audio_file} stopped at {segment.end:.1f}s ({cancel_token.reason}), returning partial result.")
+                cancel_token.mark_interrupted()
+                break
+        else:
+            completed = True
+
+    if completed and checkpoint is not None:
+        checkpoint.clear()
+
+    if remap is not None:
+        _report_silence_skipping(stats, total_duration, speech_duration, time.monotonic() - decode_start)
+
+
+def group_words_into_cues(words, max_duration=2.0):
+    """Groups a stream of words into cues no longer than `max_duration` seconds."""
     current_words = []
-    current_start_time = all_words[0].start
+    current_start_time = None
 
-    for word in all_words:
+    for word in words:
         # If adding the current word exceeds max_duration, finalize the previous segment
         if current_words and (word.end - current_start_time > max_duration):
             # Finalize the segment with the words collected so far
-            segment_text = "".join(w.word for w in current_words)
-            segment_end_time = current_words[-1].end
-            final_segments.append({
+            yield {
                 "start": current_start_time,
-                "end": segment_end_time,
-                "text": segment_text
-            })
+                "end": current_words[-1].end,
+                "text": "".join(w.word for w in current_words)
+            }
             
             # Start a new segment with the current word
             current_words = [word]
             current_start_time = word.start
         else:
             # Otherwise, add the word to the current segment
+            if not current_words:
+                current_start_time = word.start
             current_words.append(word)
 
     # Add the final remaining segment after the loop
     if current_words:
-        segment_text = "".join(w.word for w in current_words)
-        segment_end_time = current_words[-1].end
-        final_segments.append({
+        yield {
             "start": current_start_time,
-            "end": segment_end_time,
-            "text": segment_text
-        })
-        
-    return final_segments
+            "end": current_words[-1].end,
+            "text": "".join(w.word for w in current_words)
+        }
 
 
+def _report_silence_skipping(stats, total_duration, speech_duration, decode_time):
+    """Logs how much audio the VAD pre-pass skipped and estimates the decode time saved."""
+    skipped = total_duration - speech_duration
+    skipped_percent = (skipped / total_duration * 100) if total_duration else 0.0
+    # Assume skipped audio would have decoded at the same real-time factor as the speech
+    time_saved = (decode_time / speech_duration * skipped) if speech_duration else 0.0
+    logger.info(f"Silence skipping: {skipped:.1f}s of {total_duration:.1f}s skipped ({skipped_percent:.1f}%), "
+                f"~{time_saved:.1f}s of decode time saved")
+    if stats is not None:
+        stats.update({
+            "total_duration": round(total_duration, 2),
+            "speech_duration": round(speech_duration, 2),
+            "skipped_percent": round(skipped_percent, 1),
+            "estimated_time_saved": round(time_saved, 2),
+        })
 
 
 def format_timestamp(seconds):
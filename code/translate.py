@@ -1,8 +1,8 @@
+import asyncio
 import logging
-import time
 import re
 from transcribe import save_translated_text  # Assuming this is in transcribe.py
-from model import load_gemini_model          # Assuming this is in model.py
+from model import load_llm_backend           # Assuming this is in model.py
 
 # --- Setup Logging ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -46,10 +46,104 @@ def clean_translation(text):
     return text.strip()
 
 
+def _is_cancelled(cancel_token):
+    return cancel_token is not None and cancel_token.cancelled
+
+
+async def _pause(cancel_token, seconds):
+    """Sleeps before a retry, waking early if the job is cancelled."""
+    if cancel_token is not None:
+        await asyncio.to_thread(cancel_token.sleep, seconds)
+    else:
+        await asyncio.sleep(seconds)
+
+
+# --- Recursive Translator ---
+async def translate_chunk(llm, chunk_of_subs, source_language, target_language, max_retries=3, cancel_token=None, context=None):
+    """
+    Translates a chunk robustly, recursively splitting and falling back to line-by-line on error.
+    `context` is optional preceding source text shown to the model but not translated.
+    Returns the translated subtitle dicts, or fewer if the job is cancelled part way.
+    """
+    num_blocks = len(chunk_of_subs)
+    if num_blocks == 0 or _is_cancelled(cancel_token):
+        return []
+
+    # Base case
+    if num_blocks == 1:
+        for _ in range(max_retries):
+            if _is_cancelled(cancel_token):
+                return []
+            try:
+                prompt = f"Translate the following text from {source_language} to {target_language}. Do not add comments. TEXT: {chunk_of_subs[0]['text']}"
+                response = await llm.ainvoke(prompt)
+                translated_text = clean_translation(response.content)
+                if translated_text:
+                    chunk_of_subs[0]['text'] = translated_text
+                    return chunk_of_subs
+            except Exception as e:
+                logger.error(f"Single-line translation failed, retrying... Error: {e}")
+                await _pause(cancel_token, 1)
+        logger.error(f"Giving up on one line. Returning original to preserve timestamp.")
+        return chunk_of_subs
+
+    separator = "\n<--->\n"
+    texts_to_translate = [sub['text'] for sub in chunk_of_subs]
+    joined_text = separator.join(texts_to_translate)
+    context_text = f"""
+        For context only (do NOT translate or return these), the preceding subtitles were:
+        {context}
+""" if context else ""
+
+    prompt = f"""
+        You are an expert subtitle translator. Translate the following subtitles from {source_language} to {target_language}.
+
+        - Each block is separated by '{separator}'.
+        - Do not merge, omit, or add blocks. Translate each block exactly.
+        - Return the translated text using the same '{separator}' separator.
+        - Do NOT add extra text or comments.
+{context_text}
+        INPUT:
+        {joined_text}
+
+        OUTPUT:
+        """
+
+    for attempt in range(max_retries):
+        if _is_cancelled(cancel_token):
+            return []
+        try:
+            response = await llm.ainvoke(prompt)
+            translated_blob = response.content.strip()
+            if not translated_blob:
+                raise ValueError("Empty translation result.")
+
+            translated_texts = translated_blob.split(separator)
+            if len(translated_texts) == num_blocks:
+                logger.info(f"Translated {num_blocks} blocks successfully.")
+                for i in range(num_blocks):
+                    chunk_of_subs[i]['text'] = clean_translation(translated_texts[i])
+                return chunk_of_subs
+            else:
+                logger.warning(f"Mismatched chunk size (expected {num_blocks}, got {len(translated_texts)}). Retrying...")
+        except Exception as e:
+            logger.error(f"Translation attempt {attempt + 1} failed: {e}")
+            await _pause(cancel_token, 1)
+
+    logger.warning(f"Translation failed for chunk of size {num_blocks}. Splitting further.")
+    mid = num_blocks // 2
+    return (await translate_chunk(llm, chunk_of_subs[:mid], source_language, target_language, max_retries, cancel_token, context)
+            + await translate_chunk(llm, chunk_of_subs[mid:], source_language, target_language, max_retries, cancel_token, context))
+
+
 # --- Main Translation Function ---
-def translate_text(llm, text, target_language="english", source_language="german", audio_filename=None, chunk_size=50, max_retries=3):
+async def translate_text(llm, text, target_language="english", source_language="german", audio_filename=None, chunk_size=50, max_retries=3, cancel_token=None, checkpoint=None):
     """
     Translates VTT content robustly using an adaptive chunking strategy.
+    Chunks are translated concurrently through `llm.ainvoke`, so the backend's
+    concurrency limit and request pacing decide how many requests are in flight.
+    If `cancel_token` is cancelled, stops between requests and saves the blocks translated so far.
+    Completed chunks are recorded in `checkpoint`, so a restarted job skips them.
     """
     if not llm:
         logger.error("Translation model is not available.")
@@ -67,84 +161,48 @@ def translate_text(llm, text, target_language="english", source_language="german
     # Add index to track position
     indexed_subtitles = [{"index": i, "timestamp": sub["timestamp"], "text": sub["text"]} for i, sub in enumerate(original_subtitles)]
 
-    llm_with_temp = llm.with_config(configurable={'temperature': 0.1})
     all_processed_subs = []
 
-    logger.info(f"Starting translation of {len(indexed_subtitles)} blocks in chunks up to {chunk_size}...")
-
-    # --- Recursive Translator ---
-    def _translate_chunk_recursively(chunk_of_subs):
-        """
-        Translates a chunk robustly, recursively splitting and falling back to line-by-line on error.
-        """
-        num_blocks = len(chunk_of_subs)
-        if num_blocks == 0:
-            return []
+    # Chunks translated by an earlier, interrupted run of the same job
+    completed_chunks = {}
+    if checkpoint is not None:
+        for record in await asyncio.to_thread(checkpoint.load):
+            completed_chunks[record["chunk_start"]] = record["subs"]
+        if completed_chunks:
+            logger.info(f"Resuming translation with {len(completed_chunks)} chunks restored from checkpoint")
 
-        # Base case
-        if num_blocks == 1:
-            for _ in range(max_retries):
-                try:
-                    prompt = f"Translate the following text from {source_language} to {target_language}. Do not add comments. TEXT: {chunk_of_subs[0]['text']}"
-                    response = llm_with_temp.invoke(prompt)
-                    translated_text = clean_translation(response.content)
-                    if translated_text:
-                        chunk_of_subs[0]['text'] = translated_text
-                        return chunk_of_subs
-                except Exception as e:
-                    logger.error(f"Single-line translation failed, retrying... Error: {e}")
-                    time.sleep(1)
-            logger.error(f"Giving up on one line. Returning original to preserve timestamp.")
-            return chunk_of_subs
-
-        separator = "\n<--->\n"
-        texts_to_translate = [sub['text'] for sub in chunk_of_subs]
-        joined_text = separator.join(texts_to_translate)
-
-        prompt = f"""
-        You are an expert subtitle translator. Translate the following subtitles from {source_language} to {target_language}.
-
-        - Each block is separated by '{separator}'.
-        - Do not merge, omit, or add blocks. Translate each block exactly.
-        - Return the translated text using the same '{separator}' separator.
-        - Do NOT add extra text or comments.
-
-        INPUT:
-        {joined_text}
-
-        OUTPUT:
-        """
-
-        for attempt in range(max_retries):
-            try:
-                response = llm_with_temp.invoke(prompt)
-                translated_blob = response.content.strip()
-                if not translated_blob:
-                    raise ValueError("Empty translation result.")
-
-                translated_texts = translated_blob.split(separator)
-                if len(translated_texts) == num_blocks:
-                    logger.info(f"Translated {num_blocks} blocks successfully.")
-                    for i in range(num_blocks):
-                        chunk_of_subs[i]['text'] = clean_translation(translated_texts[i])
-                    return chunk_of_subs
-                else:
-                    logger.warning(f"Mismatched chunk size (expected {num_blocks}, got {len(translated_texts)}). Retrying...")
-            except Exception as e:
-                logger.error(f"Translation attempt {attempt + 1} failed: {e}")
-                time.sleep(1)
+    logger.info(f"Starting translation of {len(indexed_subtitles)} blocks in chunks up to {chunk_size}...")
 
-        logger.warning(f"Translation failed for chunk of size {num_blocks}. Splitting further.")
-        mid = num_blocks // 2
-        return _translate_chunk_recursively(chunk_of_subs[:mid]) + _translate_chunk_recursively(chunk_of_subs[mid:])
+    async def _translate(i, chunk):
+        logger.info(f"--- Processing chunk from index {i} ---")
+        translated_chunk = await translate_chunk(llm, chunk, source_language, target_language, max_retries, cancel_token)
+        # Only whole chunks are checkpointed; a chunk cut short by cancellation is redone
+        if checkpoint is not None and len(translated_chunk) == len(chunk):
+            await asyncio.to_thread(checkpoint.append, {"chunk_start": i, "subs": translated_chunk})
+        return translated_chunk
 
     # --- Main Loop ---
+    pending = []
     for i in range(0, len(indexed_subtitles), chunk_size):
-        chunk = indexed_subtitles[i:i + chunk_size]
-        logger.info(f"--- Processing chunk from index {i} ---")
-        translated_chunk = _translate_chunk_recursively(chunk)
+        if i in completed_chunks:
+            all_processed_subs.extend(completed_chunks[i])
+        else:
+            pending.append(_translate(i, indexed_subtitles[i:i + chunk_size]))
+    for translated_chunk in await asyncio.gather(*pending):
         all_processed_subs.extend(translated_chunk)
-        time.sleep(1)
+
+    if _is_cancelled(cancel_token) and len(all_processed_subs) < len(indexed_subtitles):
+        cancel_token.mark_interrupted()
+        if not cancel_token.keep_partial:
+            # Don't leave a truncated file behind for /download_translated_subtitle
+            logger.warning(f"Translation cancelled ({cancel_token.reason}), discarding partial result.")
+            return "Translation cancelled.", None
+        logger.warning(f"Translation stopped ({cancel_token.reason}) with {len(all_processed_subs)} of "
+                       f"{len(indexed_subtitles)} blocks translated. Saving partial result.")
+
+    if not all_processed_subs:
+        logger.error("Translation cancelled before any blocks were translated.")
+        return "Translation cancelled.", None
 
     logger.info("Translation finished. Sorting and saving...")
 
@@ -153,8 +211,10 @@ def translate_text(llm, text, target_language="english", source_language="german
 
     try:
         final_vtt = reconstruct_vtt(final_subs)
-        output_path = save_translated_text(final_vtt, audio_filename, source_language, target_language)
+        output_path = await asyncio.to_thread(save_translated_text, final_vtt, audio_filename, source_language, target_language)
         logger.info(f"Saved to: {output_path}")
+        if checkpoint is not None and len(final_subs) == len(indexed_subtitles):
+            await asyncio.to_thread(checkpoint.clear)
         return final_vtt, output_path
     except Exception as e:
         logger.error(f"Failed to save final file: {e}", exc_info=True)
@@ -0,0 +1,245 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PATH = os.getenv("WHISPER_PROFILE_PATH", "whisper_profile.json")
+
+# Used when no calibrated profile exists, and for non-CPU devices
+DEFAULT_SETTINGS = {"cpu_threads": 0, "num_workers": 1, "compute_type": "int8", "beam_size": 5}
+# Languages written without spaces are scored per character instead of per word
+CHARACTER_LANGUAGES = {"ja", "zh", "th", "lo", "my", "km"}
+
+# path -> (mtime, profile)
+_profile_cache = {}
+_profile_lock = threading.Lock()
+
+
+def load_profile(path=PROFILE_PATH):
+    """Loads the calibrated profile, re-reading it only when the file changes."""
+    with _profile_lock:
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        cached = _profile_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                profile = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable tuning profile {path}: {e}")
+            return None
+        _profile_cache[path] = (mtime, profile)
+        logger.info(f"Loaded Whisper tuning profile from {path}")
+        return profile
+
+
+def save_profile(profile, path=PROFILE_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp_path, path)
+    logger.info(f"Saved Whisper tuning profile to {path}")
+
+
+def get_tuned_settings(model_size=None, device="cpu", compute_type=None):
+    """
+    Returns cpu_threads, num_workers, compute_type and beam_size for a job.
+    CPU jobs use the calibrated profile for `model_size` (or the profile default);
+    an explicit `compute_type` always wins.
+    """
+    settings = dict(DEFAULT_SETTINGS)
+    profile = load_profile() if device == "cpu" else None
+    if profile:
+        tuned = profile.get("models", {}).get(model_size) or profile.get("default") or {}
+        settings.update({key: tuned[key] for key in DEFAULT_SETTINGS if key in tuned})
+    if compute_type:
+        settings["compute_type"] = compute_type
+    return settings
+
+
+def synthetic_audio(duration=30.0, sample_rate=16000):
+    """Speech-like test signal: amplitude-modulated harmonics over light noise."""
+    import numpy as np
+
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+    syllables = (np.sin(2 * np.pi * 4 * t) > 0).astype(np.float32)
+    noise = np.random.default_rng(0).normal(0, 0.01, len(t))
+    return (0.2 * voice * syllables + noise).astype(np.float32)
+
+
+def _run_once(model, audio, language, beam_size):
+    segments, _ = model.transcribe(audio, language=language, beam_size=beam_size)
+    return list(segments)
+
+
+def error_rate(reference, hypothesis, language="en"):
+    """Word error rate of `hypothesis` against `reference` (character error rate for CHARACTER_LANGUAGES)."""
+    def _tokens(text):
+        text = re.sub(r"[^\w\s]", "", text.lower())
+        return list(text.replace(" ", "")) if language in CHARACTER_LANGUAGES else text.split()
+
+    ref, hyp = _tokens(reference), _tokens(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    # Levenshtein distance over tokens, one row at a time
+    previous = list(range(len(hyp) + 1))
+    for i, ref_token in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_token in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_token != hyp_token)))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def run_trial(model_size, audio, cpu_threads, num_workers, compute_type, beam_sizes, language="en", sample_rate=16000,
+              reference=None):
+    """
+    Loads one model configuration and measures latency and throughput for each beam size,
+    plus the error rate against `reference` when one is given.
+    """
+    from faster_whisper import WhisperModel
+    from model_store import resolve_model_path
+
+    model = WhisperModel(resolve_model_path(model_size, compute_type), device="cpu", compute_type=compute_type, cpu_threads=cpu_threads, num_workers=num_workers)
+    audio_seconds = len(audio) / sample_rate
+    _run_once(model, audio, language, beam_sizes[0])  # warm-up
+
+    results = []
+    for beam_size in beam_sizes:
+        start = time.monotonic()
+        segments = _run_once(model, audio, language, beam_size)
+        latency = time.monotonic() - start
+
+        # Throughput: num_workers jobs in parallel on the same model
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            list(executor.map(lambda _: _run_once(model, audio, language, beam_size), range(num_workers)))
+        throughput = audio_seconds * num_workers / (time.monotonic() - start)
+
+        result = {"cpu_threads": cpu_threads, "num_workers": num_workers, "compute_type": compute_type,
+                  "beam_size": beam_size, "latency": round(latency, 3), "throughput": round(throughput, 2)}
+        if reference is not None:
+            result["error_rate"] = round(error_rate(reference, "".join(s.text for s in segments), language), 4)
+        logger.info(f"Trial {result}")
+        results.append(result)
+    return results
+
+
+def calibrate(model_size="small", audio_file=None, thread_counts=None, worker_counts=None,
+              compute_types=None, beam_sizes=None, objective="throughput", duration=30.0, language="en",
+              path=PROFILE_PATH, reference=None, max_error_increase=0.01, set_default=False):
+    """
+    Sweeps thread counts, worker counts and compute types on this machine and
+    stores the fastest configuration for `model_size` in the profile.
+
+    Beam size is kept at the default unless `beam_sizes` are given. A smaller beam
+    is always faster but less accurate, so beams below the default need a
+    `reference` transcript of the first `duration` seconds of `audio_file`: only
+    trials within `max_error_increase` of the most accurate default-or-larger beam
+    trial are eligible.
+
+    The result also becomes the profile default (used for uncalibrated model sizes
+    and the transcription worker count) when there is none yet or `set_default` is given.
+    """
+    default_beam = DEFAULT_SETTINGS["beam_size"]
+    beam_sizes = beam_sizes or [default_beam]
+    if reference is not None and not audio_file:
+        raise ValueError("A reference transcript needs the matching --audio; the synthetic signal has no words.")
+    if min(beam_sizes) < default_beam and reference is None:
+        raise ValueError(f"Beam sizes below {default_beam} trade accuracy for speed and need a --reference transcript to be checked.")
+
+    if audio_file:
+        from faster_whisper import decode_audio
+        audio = decode_audio(audio_file, sampling_rate=16000)[:int(duration * 16000)]
+    else:
+        audio = synthetic_audio(duration)
+
+    cpu_count = os.cpu_count() or 4
+    thread_counts = thread_counts or sorted({1, 2, 4, cpu_count})
+    worker_counts = worker_counts or [1, 2]
+    compute_types = compute_types or ["int8", "float32"]
+
+    trials = []
+    for compute_type in compute_types:
+        for cpu_threads in thread_counts:
+            for num_workers in worker_counts:
+                # Skip configurations that oversubscribe the cores
+                if cpu_threads * num_workers > cpu_count:
+                    continue
+                try:
+                    trials.extend(run_trial(model_size, audio, cpu_threads, num_workers, compute_type, beam_sizes, language,
+                                            reference=reference))
+                except Exception as e:
+                    logger.warning(f"Trial {compute_type}/{cpu_threads} threads/{num_workers} workers failed: {e}")
+
+    if not trials:
+        raise RuntimeError("No calibration trial succeeded.")
+
+    candidates = trials
+    if reference is not None:
+        baseline_trials = [r for r in trials if r["beam_size"] >= default_beam] or trials
+        baseline = min(r["error_rate"] for r in baseline_trials)
+        candidates = [r for r in trials if r["error_rate"] <= baseline + max_error_increase]
+        logger.info(f"Baseline error rate {baseline:.4f}; {len(candidates)} of {len(trials)} trials within {max_error_increase}")
+
+    if objective == "latency":
+        best = min(candidates, key=lambda r: r["latency"])
+    else:
+        best = max(candidates, key=lambda r: r["throughput"])
+
+    profile = load_profile(path) or {}
+    profile.setdefault("models", {})[model_size] = best
+    if set_default or "default" not in profile:
+        profile["default"] = best
+    profile["host"] = {"hostname": platform.node(), "cpu_count": cpu_count, "machine": platform.machine(),
+                       "calibrated_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "objective": objective}
+    profile.setdefault("trials", {})[model_size] = trials
+    save_profile(profile, path)
+    return best
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Calibrate faster-whisper CPU settings for this machine.")
+    parser.add_argument("--model", default="small", help="Model size to calibrate, e.g. tiny, base, small, medium.")
+    parser.add_argument("--audio", default=None, help="Optional audio sample; a synthetic signal is used otherwise.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of audio per trial.")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--threads", type=int, nargs="+", help="cpu_threads values to try.")
+    parser.add_argument("--workers", type=int, nargs="+", help="num_workers values to try.")
+    parser.add_argument("--compute-types", nargs="+", help="compute_type values to try.")
+    parser.add_argument("--beam-sizes", type=int, nargs="+",
+                        help=f"Beam sizes to try (default {DEFAULT_SETTINGS['beam_size']} only). Smaller beams are faster but less accurate and need --reference.")
+    parser.add_argument("--reference", default=None, help="Text file with the reference transcript of the first --duration seconds of --audio.")
+    parser.add_argument("--max-error-increase", type=float, default=0.01,
+                        help="Largest error rate increase over the default beam accepted for a faster configuration.")
+    parser.add_argument("--objective", choices=["throughput", "latency"], default="throughput")
+    parser.add_argument("--output", default=PROFILE_PATH, help="Profile file to write.")
+    parser.add_argument("--set-default", action="store_true",
+                        help="Also make this result the profile default, replacing an existing one.")
+    args = parser.parse_args()
+
+    reference = None
+    if args.reference:
+        with open(args.reference, "r", encoding="utf-8") as f:
+            reference = f.read()
+    try:
+        best = calibrate(args.model, args.audio, args.threads, args.workers, args.compute_types, args.beam_sizes,
+                         args.objective, args.duration, args.language, args.output, reference, args.max_error_increase,
+                         args.set_default)
+    except ValueError as e:
+        parser.error(str(e))
+    print(json.dumps(best, indent=2))
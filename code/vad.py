@@ -0,0 +1,118 @@
+import bisect
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+
+def energy_speech_regions(audio, sample_rate=SAMPLE_RATE, frame_ms=30, threshold_db=-40.0, min_speech=0.25, min_silence=0.5):
+    """
+    Simple RMS energy detector. Returns a list of (start, end) tuples in seconds
+    for frames louder than `threshold_db` dBFS.
+    """
+    frame_len = int(sample_rate * frame_ms / 1000)
+    num_frames = len(audio) // frame_len
+    if num_frames == 0:
+        return []
+
+    frames = audio[:num_frames * frame_len].reshape(num_frames, frame_len)
+    rms = np.sqrt(np.mean(frames.astype(np.float32) ** 2, axis=1))
+    energy_db = 20 * np.log10(np.maximum(rms, 1e-10))
+    voiced = energy_db > threshold_db
+
+    regions = []
+    frame_sec = frame_len / sample_rate
+    start = None
+    for i, is_voiced in enumerate(voiced):
+        if is_voiced and start is None:
+            start = i * frame_sec
+        elif not is_voiced and start is not None:
+            regions.append((start, i * frame_sec))
+            start = None
+    if start is not None:
+        regions.append((start, num_frames * frame_sec))
+
+    regions = _merge_regions(regions, min_silence)
+    return [(s, e) for s, e in regions if e - s >= min_speech]
+
+
+def silero_speech_regions(audio, sample_rate=SAMPLE_RATE, min_silence=0.5, threshold=0.5):
+    """
+    Speech regions from the Silero VAD model bundled with faster-whisper.
+    Unlike the energy detector this also rejects music and effects.
+    """
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    options = VadOptions(threshold=threshold, min_silence_duration_ms=int(min_silence * 1000), speech_pad_ms=0)
+    timestamps = get_speech_timestamps(audio, vad_options=options, sampling_rate=sample_rate)
+    return [(ts["start"] / sample_rate, ts["end"] / sample_rate) for ts in timestamps]
+
+
+def detect_speech_regions(audio, method="silero", padding=0.3, sample_rate=SAMPLE_RATE):
+    """
+    Returns padded, merged speech regions as (start, end) tuples in seconds.
+    """
+    if method == "silero":
+        regions = silero_speech_regions(audio, sample_rate)
+    elif method == "energy":
+        regions = energy_speech_regions(audio, sample_rate)
+    else:
+        raise ValueError(f"Unknown VAD method '{method}'. Use 'silero' or 'energy'.")
+
+    duration = len(audio) / sample_rate
+    padded = [(max(0.0, s - padding), min(duration, e + padding)) for s, e in regions]
+    return _merge_regions(padded, 0.0)
+
+
+def build_speech_audio(audio, regions, sample_rate=SAMPLE_RATE):
+    """
+    Concatenates the speech regions into one array.
+
+    Returns the speech-only audio and an offset table of
+    (speech_start, original_start, duration) tuples for `make_timestamp_mapper`.
+    """
+    pieces = []
+    offsets = []
+    speech_pos = 0.0
+    for start, end in regions:
+        piece = audio[int(start * sample_rate):int(end * sample_rate)]
+        if len(piece) == 0:
+            continue
+        pieces.append(piece)
+        duration = len(piece) / sample_rate
+        offsets.append((speech_pos, start, duration))
+        speech_pos += duration
+
+    if not pieces:
+        return np.zeros(0, dtype=audio.dtype), []
+    return np.concatenate(pieces), offsets
+
+
+def make_timestamp_mapper(offsets):
+    """
+    Returns a function mapping timestamps in the speech-only audio back onto the
+    original timeline, using the offset table from `build_speech_audio`.
+    """
+    starts = [o[0] for o in offsets]
+
+    def remap(t):
+        if not offsets:
+            return t
+        i = max(bisect.bisect_right(starts, t) - 1, 0)
+        speech_start, original_start, duration = offsets[i]
+        return original_start + min(max(t - speech_start, 0.0), duration)
+
+    return remap
+
+
+def _merge_regions(regions, min_gap):
+    merged = []
+    for start, end in sorted(regions):
+        if merged and start - merged[-1][1] <= min_gap:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged